@@ -0,0 +1,99 @@
+import os
+import pickle
+
+import event_log
+
+log = event_log.get_logger(__name__)
+
+
+class Checkpoint:
+    """Crash-safe campaign state on local disk.
+
+    Two files back a checkpoint:
+      <path>          small state snapshot (counters, RNG state, ...), replaced
+                      atomically on every save
+      <path>.results  append-only journal of result records; the snapshot
+                      remembers how many bytes of it were committed, so records
+                      written after the last snapshot are dropped on resume
+    """
+
+    def __init__(self, path, every=10):
+        self.path = path
+        self.results_path = path + ".results"
+        self.every = max(1, every)
+        self._journal = None
+        self._journal_offset = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, kind=None):
+        """Return the last saved state, or None if there is no checkpoint.
+
+        With `kind`, a checkpoint saved by another kind of campaign (see the
+        "kind" field of the saved state) raises ValueError.
+        """
+        if not self.exists():
+            return None
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        if kind is not None and state.get("kind") != kind:
+            raise ValueError(f"Checkpoint {self.path} belongs to a {state.get('kind', 'different')} campaign, not {kind}")
+        self._journal_offset = state.get("_results_offset", 0)
+        log.info("Loaded checkpoint %s", self.path)
+        return state
+
+    def due(self, iteration):
+        return iteration % self.every == 0
+
+    def save(self, state):
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal_offset = self._journal.tell()
+        state = dict(state, _results_offset=self._journal_offset)
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        log.debug("Checkpoint saved at %s", self.path)
+
+    def append_result(self, record):
+        if self._journal is None:
+            self._open_journal()
+        pickle.dump(record, self._journal, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def results(self):
+        """Read back the committed part of the result journal."""
+        records = []
+        if not os.path.exists(self.results_path):
+            return records
+        with open(self.results_path, "rb") as f:
+            while f.tell() < self._journal_offset:
+                records.append(pickle.load(f))
+        return records
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def clear(self):
+        """Start a fresh campaign: forget any previous state."""
+        self.close()
+        if self.exists():
+            log.warning("Discarding existing checkpoint %s (resume to continue it instead)", self.path)
+        for path in (self.path, self.results_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._journal_offset = 0
+
+    def _open_journal(self):
+        # Drop anything appended after the last committed snapshot.
+        mode = "r+b" if os.path.exists(self.results_path) else "w+b"
+        self._journal = open(self.results_path, mode)
+        self._journal.truncate(self._journal_offset)
+        self._journal.seek(self._journal_offset)
@@ -0,0 +1,117 @@
+import random
+import time
+
+import event_log
+
+log = event_log.get_logger(__name__)
+
+# A PostgreSQL connection that survives server restarts.
+#
+# Query errors (syntax errors, failed casts, cancelled statements) are the
+# fuzzer's business and are passed through unchanged. Connection failures
+# (the server went away, the socket broke, the backend was terminated) are
+# recognised by `is_connection_error`; `run` then reconnects with exponential
+# backoff, re-applies session settings and the caller's setup (schema,
+# fixtures), and calls the function again, so the affected test is retried
+# instead of being recorded with a wrong or empty result.
+
+# SQLSTATEs of an OperationalError that mean the backend is gone: class 08
+# (connection exception) plus admin/crash shutdown and "cannot connect now".
+LOST_SQLSTATES = ("57P01", "57P02", "57P03")
+
+# Connect failures carry no SQLSTATE; these messages mean the server answered
+# and refused us, which no amount of waiting fixes.
+PERMANENT_CONNECT_ERRORS = (
+    "authentication failed",
+    "no pg_hba.conf entry",
+    "does not exist",
+)
+
+
+class ConnectionLost(Exception):
+    """The server stayed unreachable for every reconnect attempt."""
+
+
+def is_connection_error(error, conn=None):
+    import psycopg2
+
+    if conn is not None and conn.closed:
+        return True
+    if isinstance(error, psycopg2.InterfaceError):
+        return True
+    if isinstance(error, psycopg2.OperationalError):
+        code = error.pgcode
+        return code is None or code.startswith("08") or code in LOST_SQLSTATES
+    return False
+
+
+def is_permanent_connect_error(error):
+    message = str(error)
+    return any(reason in message for reason in PERMANENT_CONNECT_ERRORS)
+
+
+class ManagedConnection:
+    def __init__(self, db_config, setup=None, session_settings=None, retries=8, backoff=0.5, max_backoff=30.0):
+        self.db_config = db_config
+        self.setup = setup
+        self.session_settings = session_settings or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self.conn = None
+        # The first connect is not retried: a wrong address or password should
+        # fail at startup, not after a round of backoff
+        self.connect()
+
+    def connect(self):
+        import psycopg2
+
+        self.conn = psycopg2.connect(**self.db_config)
+        if self.session_settings:
+            with self.conn.cursor() as cur:
+                for name, value in self.session_settings.items():
+                    cur.execute(f"SET {name} = %s", (value,))
+            self.conn.commit()
+        if self.setup is not None:
+            self.setup(self.conn)
+        return self.conn
+
+    def reconnect(self):
+        """Replace the connection, backing off exponentially (with jitter) between attempts."""
+        self.close()
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.connect()
+                self.reconnects += 1
+                log.warning("Reconnected to the database after %d attempt(s)", attempt)
+                return self.conn
+            except Exception as e:
+                if not is_connection_error(e) or is_permanent_connect_error(e):
+                    raise
+                log.warning("Reconnect attempt %d/%d failed: %s", attempt, self.retries, e)
+                self.close()
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.max_backoff)
+        raise ConnectionLost(f"Database unreachable after {self.retries} reconnect attempts")
+
+    def run(self, func, *args, **kwargs):
+        """Call `func`, reconnecting and calling it again whenever the connection is lost."""
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_connection_error(e, self.conn):
+                    raise
+                if attempt == self.retries:
+                    raise ConnectionLost(f"Connection lost {attempt + 1} times in a row") from e
+                log.error("Connection lost (%s); retrying after reconnect", e)
+                self.reconnect()
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
@@ -0,0 +1,71 @@
+import time
+
+# Connection settings for a database started by start_postgres_container()
+CONTAINER_DB_CONFIG = {
+    'dbname': 'fuzzdb',
+    'user': 'fuzzuser',
+    'password': 'fuzzpass',
+    'host': 'localhost',
+    'port': 5432
+}
+
+def start_postgres_container(name="pg_fuzzer", port=5432):
+    import docker
+
+    client = docker.from_env()
+    container = client.containers.run(
+        "postgres:latest",
+        detach=True,
+        environment={
+            "POSTGRES_USER": CONTAINER_DB_CONFIG['user'],
+            "POSTGRES_PASSWORD": CONTAINER_DB_CONFIG['password'],
+            "POSTGRES_DB": CONTAINER_DB_CONFIG['dbname']
+        },
+        ports={'5432/tcp': port},
+        name=name
+    )
+    
+    wait_until_ready(dict(CONTAINER_DB_CONFIG, port=port))
+    return container
+
+def wait_until_ready(db_config, timeout=120, interval=0.5):
+    """Block until the server accepts connections with `db_config`."""
+    import psycopg2
+
+    deadline = time.time() + timeout
+    while True:
+        try:
+            psycopg2.connect(**db_config).close()
+            return
+        except psycopg2.OperationalError:
+            # The image restarts the server once after initdb; keep trying
+            if time.time() > deadline:
+                raise TimeoutError(f"PostgreSQL on port {db_config['port']} not ready after {timeout}s")
+            time.sleep(interval)
+
+def load_fixtures(db_config):
+    """Create the fuzzing schema and fixture rows in a fresh database."""
+    from database import PostgresManager
+
+    pg = PostgresManager(db_config)
+    try:
+        pg.insert_fixtures()
+    finally:
+        pg.close()
+
+def stop_postgres_container(name="pg_fuzzer"):
+    import docker
+
+    client = docker.from_env()
+    container = client.containers.get(name)
+    container.stop()
+    container.remove()
+
+if __name__ == "__main__":
+    # Test this phase
+    print("Starting PostgreSQL container...")
+    container = start_postgres_container()
+    print(f"Container ID: {container.id}")
+    input("Press Enter to stop and remove container...")
+    stop_postgres_container()
+    print("Container cleaned up!")
@@ -1,15 +1,22 @@
-import psycopg2
-from psycopg2 import sql
+from connection import ManagedConnection, is_connection_error
+
+# psycopg2 accepts "dbname" as well as "database"
+DEFAULT_DB_CONFIG = {
+    "user": "admin",
+    "password": "admin",
+    "host": "localhost",
+    "port": "5432",
+    "database": "postgresDB"
+}
 
 class PostgresManager:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            user="admin",
-            password="admin",
-            host="localhost",
-            port="5432",
-            database="postgresDB"
-        )
+    def __init__(self, db_config=None, session_settings=None):
+        # Session settings and the schema are re-applied on every (re)connect
+        self.connection = ManagedConnection(db_config or DEFAULT_DB_CONFIG, setup=self._on_connect,
+                                            session_settings=session_settings)
+
+    def _on_connect(self, conn):
+        self.conn = conn
         self.conn.autocommit = False  # Use transactions
         self.cursor = self.conn.cursor()
         self._initialize_schema()
@@ -31,6 +38,22 @@ class PostgresManager:
         """)
         self.conn.commit()
 
+    def insert_fixtures(self):
+        """Replace the table contents with the consistent test data"""
+        self.execute_query("TRUNCATE users, employees RESTART IDENTITY")
+        self.execute_query("""
+            INSERT INTO users (name, age) VALUES
+            ('Alice', 25),   -- Exact boundary for BETWEEN
+            ('Bob', 30),     -- Mid-range
+            ('Charlie', 35)  -- Outside typical range
+        """)
+        self.execute_query("""
+            INSERT INTO employees (name, salary) VALUES
+            ('Dave', 50000),  -- Exact boundary for salary comparisons
+            ('Eve', 50001),   -- Just above threshold
+            ('Frank', 49999)   -- Just below threshold
+        """)
+
     def execute_query(self, query):
         try:
             self.cursor.execute(query)
@@ -39,18 +62,23 @@ class PostgresManager:
             self.conn.commit()
             return None
         except Exception as e:
+            # A lost connection is not an empty result; let the caller reconnect
+            if is_connection_error(e, self.conn):
+                raise
             self.conn.rollback()
             print(f"Query failed: {e}")
             return None
 
     def close(self):
-        self.cursor.close()
-        self.conn.close()
-
-# Test this phase
-print("\nTesting database connection...")
-pg_manager = PostgresManager()
-pg_manager.execute_query("INSERT INTO users (name, age) VALUES ('Test User', 30)")
-results = pg_manager.execute_query("SELECT * FROM users")
-print("Test query results:", results)
-pg_manager.close()
\ No newline at end of file
+        if not self.conn.closed:
+            self.cursor.close()
+        self.connection.close()
+
+if __name__ == "__main__":
+    # Test this phase
+    print("\nTesting database connection...")
+    pg_manager = PostgresManager()
+    pg_manager.execute_query("INSERT INTO users (name, age) VALUES ('Test User', 30)")
+    results = pg_manager.execute_query("SELECT * FROM users")
+    print("Test query results:", results)
+    pg_manager.close()
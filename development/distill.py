@@ -0,0 +1,76 @@
+import seeding
+import planner
+import event_log
+from connection import ConnectionLost
+
+log = event_log.get_logger(__name__)
+
+# Corpus distillation: keep the smallest set of seed queries that still covers
+# every plan shape and EET rule seen across the whole corpus. A seed's
+# features are the signatures of its EXPLAIN plans (optionally under every
+# planner configuration) plus the rules its mutants exercise.
+
+
+def read_corpus(filename):
+    """Seed queries from a file of ';'-separated statements."""
+    with open(filename) as f:
+        return [query.strip() for query in f.read().split(";") if query.strip()]
+
+
+def write_corpus(filename, queries):
+    with open(filename, "w") as f:
+        for query in queries:
+            f.write(query + ";\n\n")
+
+
+def seed_features(fuzzer, query, samples=8, planner_matrix=False):
+    """Plan signatures and EET rules of one seed, as a set of tagged strings."""
+    features = set()
+    for test_index in range(samples):
+        seeding.regenerate(fuzzer.mutator, query, fuzzer.seed, test_index)
+        features.update(f"rule:{type(fuzzer.mutator).__module__}:{rule}" for rule in fuzzer.mutator.applied_rules)
+
+    configurations = planner.PLANNER_MATRIX if planner_matrix else [None]
+    try:
+        for settings in configurations:
+            if settings is not None:
+                with fuzzer.conn.cursor() as cur:
+                    cur.execute(planner.settings_sql(settings, fuzzer.connection.session_settings))
+            features.add("plan:" + planner.plan_signature(fuzzer.get_execution_plan(query)))
+    finally:
+        if not fuzzer.conn.closed:
+            fuzzer.conn.rollback()
+    return features
+
+
+def greedy_cover(features_by_seed):
+    """Greedy set cover: seeds in pick order, each adding the most uncovered features.
+
+    Ties go to the shorter query, which is cheaper to run and to reduce.
+    """
+    uncovered = set().union(*features_by_seed.values()) if features_by_seed else set()
+    remaining = dict(features_by_seed)
+    chosen = []
+    while uncovered:
+        best = max(remaining, key=lambda query: (len(remaining[query] & uncovered), -len(query)))
+        gained = remaining.pop(best) & uncovered
+        if not gained:
+            break
+        chosen.append(best)
+        uncovered -= gained
+    return chosen
+
+
+def distill(fuzzer, queries, samples=8, planner_matrix=False):
+    features_by_seed = {}
+    for query in dict.fromkeys(queries):
+        try:
+            features_by_seed[query] = fuzzer.connection.run(seed_features, fuzzer, query, samples, planner_matrix)
+        except ConnectionLost:
+            raise
+        except Exception as e:
+            log.warning("Dropping seed that cannot be planned: %s (%s)", query, e)
+    chosen = greedy_cover(features_by_seed)
+    covered = set().union(*features_by_seed.values()) if features_by_seed else set()
+    log.info("Distilled %d seeds to %d covering %d features", len(features_by_seed), len(chosen), len(covered))
+    return chosen
@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+import event_log
+import seeding
+from distill import read_corpus
+
+log = event_log.get_logger(__name__)
+
+# Coordinator/worker mode.
+#
+# The coordinator splits a campaign into tasks (seed query x rule module x test
+# index range, all under one campaign seed) and serves them over TCP; every worker runs its own database
+# (optionally in its own container) and the DBFuzzer loop of the requested
+# rule module. Messages are one JSON object per line:
+#
+#   worker -> {"type": "ready", "worker": name}
+#   coord  -> {"type": "task", "task_id", "query", "rule", "seed", "tests": [start, stop]}
+#          or {"type": "wait"}    (queue empty, tasks still in flight: ask again later)
+#          or {"type": "done"}    (every task has been completed)
+#   worker -> {"type": "result", "task_id", "tests", "elapsed", "bugs": [...]}
+#
+# Bugs carry (seed, test) instead of the mutant text; the coordinator
+# regenerates mutants when writing its report. A task whose worker disconnects
+# before reporting is handed out again, up to MAX_TASK_ATTEMPTS times; after
+# that it is given up (and listed in the report) so it cannot take down the
+# whole fleet one worker at a time.
+
+DEFAULT_PORT = 7654
+WAIT_INTERVAL = 2.0
+MAX_TASK_ATTEMPTS = 3
+DEFAULT_RULES = [
+    "eet_transformation2",
+    "eet_transformation_rule1",
+    "eet_transformation_rule2",
+    "eet_transformation_rule3",
+]
+DEFAULT_QUERIES = [
+    "SELECT name, age FROM users WHERE age > 25 AND age < 40",
+    "SELECT name, salary FROM employees WHERE salary > 50000 OR salary < 20000",
+    "SELECT name, age FROM users WHERE age BETWEEN 20 AND 30",
+]
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+
+def _receive(stream):
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+def bug_key(bug):
+    """Bugs with the same query, rule and result pair count as one."""
+    digest = hashlib.sha1()
+    for field in ("query", "rule", "original_result", "mutated_result"):
+        digest.update(str(bug[field]).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Coordinator:
+    def __init__(self, queries, rules, seed=None, test_count=100, tests_per_task=10, max_attempts=MAX_TASK_ATTEMPTS):
+        self.tasks = queue.Queue()
+        self.pending = {}
+        self.attempts = {}
+        self.failed = []
+        self.max_attempts = max_attempts
+        self.bugs = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.seed = seeding.new_campaign_seed() if seed is None else seed
+
+        task_id = 0
+        for query in queries:
+            for rule in rules:
+                for start in range(0, test_count, tests_per_task):
+                    self.tasks.put({
+                        "type": "task",
+                        "task_id": task_id,
+                        "query": query,
+                        "rule": rule,
+                        "seed": self.seed,
+                        "tests": [start, min(start + tests_per_task, test_count)],
+                    })
+                    task_id += 1
+        self.total_tasks = task_id
+        self.completed_tasks = 0
+
+    def next_task(self):
+        """A task to run, or a "wait"/"done" message when the queue is empty.
+
+        Workers are only released once every task is completed, since a task
+        still in flight may be re-queued if its worker disconnects.
+        """
+        with self.lock:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                return {"type": "done" if self.completed_tasks == self.total_tasks else "wait"}
+            self.pending[task["task_id"]] = task
+        return task
+
+    def requeue(self, task_id):
+        with self.lock:
+            task = self.pending.pop(task_id, None)
+            if task is None:
+                return
+            self.attempts[task_id] = self.attempts.get(task_id, 0) + 1
+            if self.attempts[task_id] >= self.max_attempts:
+                log.error("Giving up on task %d after %d lost workers", task_id, self.attempts[task_id])
+                self.failed.append(task)
+                self.completed_tasks += 1
+                if self.completed_tasks == self.total_tasks:
+                    self.finished.set()
+                return
+        log.warning("Re-queueing task %d", task_id)
+        self.tasks.put(task)
+
+    def record_result(self, worker, result):
+        with self.lock:
+            if self.pending.pop(result["task_id"], None) is None:
+                return  # duplicate report of a re-queued task
+            self.completed_tasks += 1
+            for bug in result["bugs"]:
+                key = bug_key(bug)
+                if key in self.bugs:
+                    self.bugs[key]["count"] += 1
+                else:
+                    self.bugs[key] = dict(bug, count=1, worker=worker)
+                    log.warning("New bug from %s (rule %s)", worker, bug["rule"])
+            tests, elapsed = self.stats.get(worker, (0, 0.0))
+            self.stats[worker] = (tests + result["tests"], elapsed + result["elapsed"])
+            if self.completed_tasks == self.total_tasks:
+                self.finished.set()
+
+    def throughput(self):
+        """Tests per second for each worker, plus the sum."""
+        with self.lock:
+            rates = {worker: tests / elapsed if elapsed else 0.0 for worker, (tests, elapsed) in self.stats.items()}
+        rates["total"] = sum(rates.values())
+        return rates
+
+    def serve(self, host="0.0.0.0", port=DEFAULT_PORT):
+        server = socketserver.ThreadingTCPServer((host, port), _CoordinatorHandler, bind_and_activate=False)
+        server.allow_reuse_address = True
+        server.daemon_threads = True
+        server.server_bind()
+        server.server_activate()
+        server.coordinator = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        log.info("Coordinator listening on %s:%d with %d tasks", host, server.server_address[1], self.total_tasks)
+        try:
+            self.finished.wait()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def save_report(self, filename="distributed_bug_report.txt"):
+        mutators = {}
+        with open(filename, "w") as f:
+            for bug in self.bugs.values():
+                if bug["rule"] not in mutators:
+                    mutators[bug["rule"]] = importlib.import_module(bug["rule"]).PGQueryMutator()
+                mutated_query = seeding.regenerate(mutators[bug["rule"]], bug["query"], bug["seed"], bug["test"])
+                f.write("\n==== BUG REPORT ==== " + f"[rule {bug['rule']}, seed {bug['seed']}, test {bug['test']}, seen {bug['count']}x, first on {bug['worker']}]\n")
+                f.write("Original Query:\n" + bug["query"] + "\n")
+                f.write("Mutated Query:\n" + mutated_query + "\n")
+                f.write("Original Result:\n" + bug["original_result"] + "\n")
+                f.write("Mutated Result:\n" + bug["mutated_result"] + "\n")
+                f.write("Original Plan:\n" + bug["original_plan"] + "\n")
+                f.write("Mutated Plan:\n" + bug["mutated_plan"] + "\n")
+                f.write("=====================\n\n")
+            if self.failed:
+                f.write("==== FAILED TASKS (worker lost every time) ====\n")
+                for task in self.failed:
+                    f.write(f"task {task['task_id']}: rule {task['rule']}, tests {task['tests'][0]}-{task['tests'][1] - 1}, query {task['query']}\n")
+            f.write("==== THROUGHPUT (tests/s) ====\n")
+            for worker, rate in self.throughput().items():
+                f.write(f"{worker}: {rate:.2f}\n")
+
+
+class _CoordinatorHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        stream = self.request.makefile("rw")
+        worker = f"{self.client_address[0]}:{self.client_address[1]}"
+        task = None
+        try:
+            while True:
+                message = _receive(stream)
+                if message is None:
+                    break
+                if message["type"] == "ready":
+                    worker = message.get("worker", worker)
+                    reply = coordinator.next_task()
+                    _send(stream, reply)
+                    if reply["type"] == "done":
+                        break
+                    task = reply if reply["type"] == "task" else None
+                elif message["type"] == "result":
+                    coordinator.record_result(worker, message)
+                    task = None
+        except (ConnectionError, ValueError) as e:
+            log.warning("Lost worker %s: %s", worker, e)
+        finally:
+            if task is not None:
+                coordinator.requeue(task["task_id"])
+
+
+def _collecting_fuzzer(fuzzer_class):
+    """Subclass a rule module's DBFuzzer so bug reports are also kept for the coordinator."""
+
+    class CollectingFuzzer(fuzzer_class):
+        def __init__(self, db_config, seed=None):
+            super().__init__(db_config, seed)
+            self.bugs = []
+
+        def report_bug(self, original_query, mutated_query, original_result, mutated_result, original_plan, mutated_plan, test_index=None, settings=None):
+            super().report_bug(original_query, mutated_query, original_result, mutated_result, original_plan, mutated_plan, test_index, settings)
+            self.bugs.append({
+                "query": original_query,
+                "seed": self.seed,
+                "test": test_index,
+                "settings": settings,
+                "original_result": str(original_result),
+                "mutated_result": str(mutated_result),
+                "original_plan": str(original_plan),
+                "mutated_plan": str(mutated_plan),
+            })
+
+    return CollectingFuzzer
+
+
+def run_worker(host, port, db_config, name=None):
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    fuzzers = {}
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile("rw")
+        try:
+            while True:
+                _send(stream, {"type": "ready", "worker": name})
+                task = _receive(stream)
+                if task is None or task["type"] == "done":
+                    break
+                if task["type"] == "wait":
+                    time.sleep(WAIT_INTERVAL)
+                    continue
+
+                if task["rule"] not in fuzzers:
+                    module = importlib.import_module(task["rule"])
+                    fuzzers[task["rule"]] = _collecting_fuzzer(module.DBFuzzer)(db_config)
+                fuzzer = fuzzers[task["rule"]]
+                fuzzer.seed = task["seed"]
+                fuzzer.bugs = []
+
+                started = time.time()
+                start, stop = task["tests"]
+                for test_index in range(start, stop):
+                    fuzzer.run_test(task["query"], test_index)
+                bugs = [dict(bug, rule=task["rule"]) for bug in fuzzer.bugs]
+
+                _send(stream, {
+                    "type": "result",
+                    "task_id": task["task_id"],
+                    "tests": stop - start,
+                    "elapsed": time.time() - started,
+                    "bugs": bugs,
+                })
+        finally:
+            for fuzzer in fuzzers.values():
+                fuzzer.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed EET fuzzing")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coord = sub.add_parser("coordinator")
+    coord.add_argument("--host", default="0.0.0.0")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coord.add_argument("--queries", help="file of ';'-separated seed queries")
+    coord.add_argument("--rules", default=",".join(DEFAULT_RULES), help="comma-separated rule modules")
+    coord.add_argument("--seed", type=int, help="campaign seed (random if omitted)")
+    coord.add_argument("--tests", type=int, default=100, help="tests per query and rule")
+    coord.add_argument("--tests-per-task", type=int, default=10)
+
+    work = sub.add_parser("worker")
+    work.add_argument("--coordinator", default=f"localhost:{DEFAULT_PORT}", help="host:port")
+    work.add_argument("--name")
+    work.add_argument("--start-container", action="store_true", help="run a private PostgreSQL container")
+    work.add_argument("--container-name", default="pg_fuzzer")
+    work.add_argument("--db-port", type=int, default=5432)
+
+    args = parser.parse_args()
+    event_log.configure(file_level="INFO", logfile=f"{args.role}.log")
+    event_log.install_crash_dump()
+
+    if args.role == "coordinator":
+        coordinator = Coordinator(
+            read_corpus(args.queries) if args.queries else DEFAULT_QUERIES,
+            args.rules.split(","),
+            seed=args.seed,
+            test_count=args.tests,
+            tests_per_task=args.tests_per_task,
+        )
+        try:
+            coordinator.serve(args.host, args.port)
+        finally:
+            coordinator.save_report()
+            print(f"{len(coordinator.bugs)} unique bugs, throughput: {coordinator.throughput()}")
+    else:
+        host, port = args.coordinator.rsplit(":", 1)
+        if args.start_container:
+            import containers
+            containers.start_postgres_container(name=args.container_name, port=args.db_port)
+            db_config = dict(containers.CONTAINER_DB_CONFIG, port=args.db_port)
+            # A fresh container has no tables: every mutant would be rejected
+            containers.load_fixtures(db_config)
+        else:
+            db_config = {
+                'dbname': 'postgresDB',
+                'user': 'admin',
+                'password': 'admin',
+                'host': 'localhost',
+                'port': args.db_port
+            }
+        try:
+            run_worker(host, int(port), db_config, name=args.name)
+        finally:
+            if args.start_container:
+                containers.stop_postgres_container(name=args.container_name)
@@ -1,5 +1,8 @@
 from sqlglot import parse_one, exp, transpile
 import random
+import event_log
+
+log = event_log.get_logger(__name__)
 
 class PGQueryMutator:
     def __init__(self):
@@ -9,8 +12,12 @@ class PGQueryMutator:
             self._reorder_projections,
             self._swap_operators
         ]
+        self.rng = random.Random()
     
-    def mutate(self, original_query):
+    def mutate(self, original_query, rng=None):
+        previous_rng = self.rng
+        if rng is not None:
+            self.rng = rng
         try:
             # Parse with PostgreSQL dialect
             parsed = parse_one(original_query, dialect="postgres")
@@ -19,7 +26,7 @@ class PGQueryMutator:
             # Apply transformations until modification
             original_sql = transformed.sql(dialect="postgres")
             for _ in range(5):
-                transformation = random.choice(self.transformations)
+                transformation = self.rng.choice(self.transformations)
                 transformed = transformed.transform(transformation)
                 if transformed.sql(dialect="postgres") != original_sql:
                     break
@@ -27,11 +34,16 @@ class PGQueryMutator:
             # Convert to PostgreSQL syntax explicitly
             return transformed.sql(dialect="postgres", pretty=True)
         except Exception as e:
-            print(f"Mutation error: {e}")
+            log.warning("Mutation error: %s", e)
             return original_query
+        finally:
+            self.rng = previous_rng
 
     #forcing known mutation
-    def mutate(self, original_query):
+    def mutate(self, original_query, rng=None):
+        previous_rng = self.rng
+        if rng is not None:
+            self.rng = rng
         try:
             parsed = parse_one(original_query, dialect="postgres")
             
@@ -44,8 +56,10 @@ class PGQueryMutator:
             
             return transformed.sql(dialect="postgres")
         except Exception as e:
-            print(f"Mutation error: {e}")
+            log.warning("Mutation error: %s", e)
             return original_query
+        finally:
+            self.rng = previous_rng
 
     def _swap_and_clauses(self, node):
         if isinstance(node, exp.And):
@@ -63,7 +77,7 @@ class PGQueryMutator:
 
     def _reorder_projections(self, node):
         if isinstance(node, exp.Select) and len(node.expressions) > 1:
-            new_order = random.sample(node.expressions, len(node.expressions))
+            new_order = self.rng.sample(node.expressions, len(node.expressions))
             node.set("expressions", new_order)
         return node
 
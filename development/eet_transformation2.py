@@ -1,173 +1,424 @@
+import argparse
+import logging
 import random
-import psycopg2
 import time
-import psutil
 from sqlglot import parse_one, exp
+import event_log
+import seeding
+import validator
+import planner
+import predicates
+from checkpoint import Checkpoint
+from connection import ManagedConnection, is_connection_error
+
+log = event_log.get_logger(__name__)
 
 class PGQueryMutator:
     def __init__(self):
         self.transformations = [
             self._apply_eet_rule
         ]
+        self.rng = random.Random()
+        # EET rules used by the last mutate() call, and the (rule, node) pairs
+        # they produced in its tree
+        self.applied_rules = []
+        self.rewrites = []
+
+    def mutate(self, original_query, rng=None):
+        """Mutate `original_query`; pass a per-test `rng` to make the mutant reproducible.
 
-    def mutate(self, original_query):
+        The `rng` is used for this call only; `self.rng` is restored afterwards.
+        """
+        previous_rng = self.rng
+        if rng is not None:
+            self.rng = rng
+        self.applied_rules = []
+        self.rewrites = []
         try:
-            print("[DEBUG] Parsing original query")
+            log.debug("Parsing original query")
             parsed = parse_one(original_query, dialect="postgres")
             transformed = parsed.copy()
             original_sql = transformed.sql(dialect="postgres")
             for _ in range(5):
-                transformation = random.choice(self.transformations)
+                transformation = self.rng.choice(self.transformations)
                 transformed = transformed.transform(transformation)
                 if transformed.sql(dialect="postgres") != original_sql:
-                    print("[DEBUG] Transformation applied")
+                    log.debug("Transformation applied")
                     break
             return transformed.sql(dialect="postgres", pretty=True)
         except Exception as e:
-            print(f"Mutation error: {e}")
+            log.warning("Mutation error: %s", e)
             return original_query
+        finally:
+            self.rng = previous_rng
 
     def _apply_eet_rule(self, node):
-        if random.random() > 0.7:
+        if self.rng.random() > 0.7:
             return node  # Skip mutation most of the time to reach deeper nodes
 
         if isinstance(node, (exp.EQ, exp.GT, exp.LT, exp.And, exp.Or)):
-            rule = random.choice([1, 2])
-            print(f"[DEBUG] Applying EET rule {rule}")
+            rule = self.rng.choice([1, 2])
+            log.debug("Applying EET rule %d", rule)
             if rule == 1:
-                return exp.Paren(
+                return self._rewritten(rule, exp.Paren(
                     this=exp.Or(
-                        this=exp.Paren(this=self._false_expr(self._rand_bool_expr())),
+                        this=exp.Paren(this=self._predicate("false")),
                         expression=node
                     )
-                )
+                ))
             elif rule == 2:
-                return exp.Paren(
+                return self._rewritten(rule, exp.Paren(
                     this=exp.And(
-                        this=exp.Paren(this=self._true_expr(self._rand_bool_expr())),
+                        this=exp.Paren(this=self._predicate("true")),
                         expression=node
                     )
-                )
+                ))
 
         elif isinstance(node, exp.Between):
-            rule = random.choice([3, 4])
-            print(f"[DEBUG] Applying EET rule {rule}")
+            rule = self.rng.choice([3, 4])
+            log.debug("Applying EET rule %d", rule)
 
             low = node.args['low']
             high = node.args['high']
 
             if rule == 3:
-                return exp.Between(
+                return self._rewritten(rule, exp.Between(
                     this=node.this,
                     low=exp.Case(
-                        ifs=[exp.When(this=self._false_expr(self._rand_bool_expr()), expression=self._rand_simple_expr(low))],
+                        ifs=[exp.When(this=self._predicate("false"), expression=self._rand_simple_expr(low))],
                         default=low
                     ),
                     high=exp.Case(
-                        ifs=[exp.When(this=self._false_expr(self._rand_bool_expr()), expression=self._rand_simple_expr(high))],
+                        ifs=[exp.When(this=self._predicate("false"), expression=self._rand_simple_expr(high))],
                         default=high
                     )
-                )
+                ))
             elif rule == 4:
-                return exp.Between(
+                return self._rewritten(rule, exp.Between(
                     this=node.this,
                     low=exp.Case(
-                        ifs=[exp.When(this=self._true_expr(self._rand_bool_expr()), expression=low)],
+                        ifs=[exp.When(this=self._predicate("true"), expression=low)],
                         default=self._rand_simple_expr(low)
                     ),
                     high=exp.Case(
-                        ifs=[exp.When(this=self._true_expr(self._rand_bool_expr()), expression=high)],
+                        ifs=[exp.When(this=self._predicate("true"), expression=high)],
                         default=self._rand_simple_expr(high)
                     )
-                )
+                ))
+
+        return node
 
+    def _rewritten(self, rule, node):
+        """Record that `rule` produced `node`, so rejections can be charged to it."""
+        self.applied_rules.append(rule)
+        self.rewrites.append((rule, node))
         return node
 
     def _true_expr(self, p):
-        return exp.And(this=p, expression=exp.And(this=p.copy().not_(), expression=exp.Is(this=p.copy(), expression=exp.Null())))
+        return predicates.build_true(p)
 
     def _false_expr(self, p):
-        not_null_expr = exp.Not(this=exp.Is(this=p.copy(), expression=exp.Null()))
-        return exp.And(this=p, expression=exp.And(this=p.copy().not_(), expression=not_null_expr))
+        return predicates.build_false(p)
 
     def _rand_bool_expr(self):
-        return exp.EQ(this=exp.Literal.number(random.randint(0, 10)), expression=exp.Literal.number(random.randint(0, 10)))
+        return exp.EQ(this=exp.Literal.number(self.rng.randint(0, 10)), expression=exp.Literal.number(self.rng.randint(0, 10)))
+
+    def _predicate(self, kind):
+        """Cached `_true_expr`/`_false_expr` of a random `n = m`, with the same rng draws."""
+        return predicates.fragment(kind, self.rng.randint(0, 10), self.rng.randint(0, 10))
 
     def _rand_simple_expr(self, node):
         if isinstance(node, exp.Column) or isinstance(node, exp.Literal):
             node_str = str(node).lower()
             if any(keyword in node_str for keyword in ['age', 'salary', 'id', 'count', 'price']):
-                return exp.Literal.number(random.randint(1, 100))
+                return exp.Literal.number(self.rng.randint(1, 100))
             else:
                 return exp.Literal.string('random_value')
-        return exp.Literal.number(random.randint(1, 100))
+        return exp.Literal.number(self.rng.randint(1, 100))
 
 class DBFuzzer:
-    def __init__(self, db_config):
-        self.conn = psycopg2.connect(**db_config)
-        self.mutator = PGQueryMutator()
+    mutator_class = PGQueryMutator
+
+    def __init__(self, db_config, seed=None, validate=True, planner_matrix=False, server_monitor=None, session_settings=None):
+        self.mutator = self.mutator_class()
+        self.seed = seeding.new_campaign_seed() if seed is None else seed
+        self.bugs_found = 0
+        # Indexes of the tests that found a bug; replayable from (seed, test)
+        self.bug_tests = []
+        self.validate = validate
+        self.validator = None
+        self.planner_matrix = planner_matrix
+        self.plan_shapes = set()
+        self.indexed = set()
+        # (table, column) -> error, for supporting indexes that could not be created
+        self.index_failures = {}
+        self.server_monitor = server_monitor
+        # session_settings ({GUC: value}, e.g. statement_timeout) are re-applied on every reconnect
+        self.connection = ManagedConnection(db_config, setup=self._on_connect, session_settings=session_settings)
+
+    @property
+    def conn(self):
+        return self.connection.conn
+
+    def _on_connect(self, conn):
+        # Supporting indexes may not have survived a server restart
+        self.indexed.clear()
 
     def get_execution_plan(self, query):
+        # VERBOSE adds the "Query Identifier" the server monitor attributes costs by
+        options = "FORMAT JSON, VERBOSE" if self.server_monitor is not None else "FORMAT JSON"
         with self.conn.cursor() as cur:
-            cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+            cur.execute(f"EXPLAIN ({options}) {query}")
             plan = cur.fetchone()
             return plan
 
+    def _attribute(self, plan, role, test_index):
+        if self.server_monitor is None or not plan:
+            return
+        query_id = plan[0][0].get("Query Identifier")
+        self.server_monitor.register(query_id, type(self.mutator).__module__, role, test_index)
+
     def execute_query(self, query):
         with self.conn.cursor() as cur:
             try:
-                print(f"[DEBUG] Executing query: {query}")
+                log.debug("Executing query: %s", query)
                 cur.execute(query)
                 result = cur.fetchall()
                 return result
             except Exception as e:
-                self.conn.rollback()
-                print(f"[ERROR] Query execution failed: {e}")
+                if not self.conn.closed:
+                    self.conn.rollback()
+                log.error("Query execution failed: %s", e)
                 raise e
 
-    def fuzz(self, query, iterations=10):
-        for i in range(iterations):
-            print(f"[DEBUG] Starting iteration {i+1}")
-            mutated_query = self.mutator.mutate(query)
-            try:
+    def mutant(self, query, test_index):
+        """Regenerate the mutant of test `test_index` in this campaign."""
+        return seeding.regenerate(self.mutator, query, self.seed, test_index)
+
+    def run_test(self, query, test_index):
+        """Run one original/mutant comparison; return True if it found a bug.
+
+        If the connection is lost, the test is retried on a new one.
+        """
+        return self.connection.run(self._run_test, query, test_index)
+
+    def _run_test(self, query, test_index):
+        log.debug("Starting test %d", test_index)
+        mutated_query = self.mutant(query, test_index)
+        if self.validate:
+            if self.validator is None:
+                self.validator = validator.MutantValidator(validator.load_schema(self.conn))
+            module = type(self.mutator).__module__
+            rewrites = [(f"{module}:{rule}", node) for rule, node in self.mutator.rewrites]
+            reason = self.validator.validate(mutated_query, rewrites)
+            if reason is not None:
+                log.info("Test %d: skipped invalid mutant (%s)", test_index, reason)
+                return False
+        if self.planner_matrix:
+            return self._run_matrix(query, mutated_query, test_index)
+        try:
+            original_result = self.execute_query(query)
+            original_plan = self.get_execution_plan(query)
+            mutated_result = self.execute_query(mutated_query)
+            mutated_plan = self.get_execution_plan(mutated_query)
+            self._attribute(original_plan, "original", test_index)
+            self._attribute(mutated_plan, "mutant", test_index)
+
+            if original_result != mutated_result:
+                self.bugs_found += 1
+                self.report_bug(query, mutated_query, original_result, mutated_result, original_plan, mutated_plan,
+                                test_index=test_index)
+                return True
+            log.info("Test %d: No inconsistency detected.", test_index)
+
+        except Exception as e:
+            if is_connection_error(e, self.conn):
+                raise
+            log.error("Error executing query: %s", e)
+        return False
+
+    def _run_matrix(self, query, mutated_query, test_index):
+        """Run the pair under every PLANNER_MATRIX entry inside one transaction.
+
+        Rows are compared order-insensitively, since different plans may
+        return them in different orders. Besides original vs mutant, the
+        original under each configuration is checked against the default one.
+        """
+        found = False
+        baseline = None
+        try:
+            self._ensure_indexes(query)
+            for settings in planner.PLANNER_MATRIX:
+                with self.conn.cursor() as cur:
+                    cur.execute(planner.settings_sql(settings, self.connection.session_settings))
                 original_result = self.execute_query(query)
                 original_plan = self.get_execution_plan(query)
                 mutated_result = self.execute_query(mutated_query)
                 mutated_plan = self.get_execution_plan(mutated_query)
+                self._attribute(original_plan, "original", test_index)
+                self._attribute(mutated_plan, "mutant", test_index)
+                self.plan_shapes.add(planner.plan_signature(original_plan))
+                self.plan_shapes.add(planner.plan_signature(mutated_plan))
 
-                if original_result != mutated_result:
-                    self.report_bug(query, mutated_query, original_result, mutated_result, original_plan, mutated_plan)
-                else:
-                    print(f"[+] Iteration {i+1}: No inconsistency detected.")
+                original_rows = sorted(original_result, key=repr)
+                if baseline is None:
+                    baseline = (original_result, original_plan, original_rows)
+                if original_rows != sorted(mutated_result, key=repr):
+                    found = True
+                    self.report_bug(query, mutated_query, original_result, mutated_result, original_plan, mutated_plan,
+                                    test_index=test_index, settings=settings)
+                elif original_rows != baseline[2]:
+                    found = True
+                    self.report_bug(query, query, baseline[0], original_result, baseline[1], original_plan,
+                                    test_index=test_index, settings=settings)
+            if found:
+                self.bugs_found += 1
+            else:
+                log.info("Test %d: No inconsistency under %d planner configurations (%d plan shapes seen).",
+                         test_index, len(planner.PLANNER_MATRIX), len(self.plan_shapes))
+        except Exception as e:
+            if is_connection_error(e, self.conn):
+                raise
+            log.error("Error executing query: %s", e)
+        finally:
+            # Ends the transaction and with it every SET LOCAL
+            if not self.conn.closed:
+                self.conn.rollback()
+        return found
 
+    def _ensure_indexes(self, query):
+        """Create supporting indexes for the columns `query` filters on, once per table/column.
+
+        Best effort: a column whose index cannot be created is remembered in
+        `index_failures` and not tried again; the matrix runs without it.
+        """
+        missing = [pair for pair in planner.indexable_columns(query)
+                   if pair not in self.indexed and pair not in self.index_failures]
+        if not missing:
+            return
+        self.conn.rollback()
+        for table, column in missing:
+            log.debug("Creating supporting index on %s(%s)", table, column)
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(f'CREATE INDEX IF NOT EXISTS "fuzz_{table}_{column}_idx" ON "{table}" ("{column}")')
+                self.conn.commit()
+                self.indexed.add((table, column))
             except Exception as e:
-                print(f"Error executing query: {e}")
+                if is_connection_error(e, self.conn):
+                    raise
+                self.conn.rollback()
+                self.index_failures[(table, column)] = str(e).strip()
+                log.warning("No supporting index on %s(%s): %s", table, column, e)
+
+    def fuzz(self, query, iterations=10, checkpoint=None, resume=False):
+        """Run tests 0..`iterations`-1 of `query`.
+
+        With a `Checkpoint`, progress (campaign seed, test counter, bug count)
+        is saved periodically and after every bug, and each bug's test is
+        journalled; `resume=True` continues a previous run of the same query
+        from its last saved test, with `bug_tests` restored from the journal.
+        """
+        log.info("Starting fuzzer (campaign seed %d)...", self.seed)
+        start = 0
+        if checkpoint is not None:
+            state = checkpoint.load(self._checkpoint_kind()) if resume else None
+            if state is not None:
+                if state["query"] != query:
+                    raise ValueError(f"Checkpoint {checkpoint.path} belongs to a different query")
+                start = state["iteration"]
+                self.seed = state["seed"]
+                self.bugs_found = state["bugs_found"]
+                self.bug_tests = [record["test"] for record in checkpoint.results() if record["seed"] == self.seed]
+                log.info("Resuming at test %d of %d (%d bug tests so far)", start, iterations, len(self.bug_tests))
+            else:
+                checkpoint.clear()
+
+        for i in range(start, iterations):
+            bug = self.run_test(query, i)
+            if bug:
+                self.bug_tests.append(i)
+                if checkpoint is not None:
+                    checkpoint.append_result({"seed": self.seed, "test": i})
 
             self.log_system_performance()
 
-    def report_bug(self, original_query, mutated_query, original_result, mutated_result, original_plan, mutated_plan):
-        print("[!] Potential bug detected!")
+            if checkpoint is not None and (bug or checkpoint.due(i + 1) or i + 1 == iterations):
+                checkpoint.save(self._checkpoint_state(query, i + 1))
+
+        if checkpoint is not None:
+            checkpoint.close()
+        self.log_rejections()
+
+    def log_rejections(self):
+        if self.validator is None:
+            return
+        for rule, rate in sorted(self.validator.rejection_rates().items()):
+            if rate:
+                log.warning("Rule %s: %.0f%% of mutants rejected before execution", rule, rate * 100)
+
+    def _checkpoint_kind(self):
+        # Mutants depend on the rule module, so its checkpoints are not interchangeable
+        return f"DBFuzzer:{type(self.mutator).__module__}"
+
+    def _checkpoint_state(self, query, iteration):
+        return {
+            "kind": self._checkpoint_kind(),
+            "query": query,
+            "iteration": iteration,
+            "seed": self.seed,
+            "bugs_found": self.bugs_found,
+        }
+
+    def report_bug(self, original_query, mutated_query, original_result, mutated_result, original_plan, mutated_plan, test_index=None, settings=None):
+        log.warning("Potential bug detected!")
         with open("bug_report.txt", "a") as f:
             f.write("\n==== BUG REPORT ====" + time.strftime("[%Y-%m-%d %H:%M:%S]") + "\n")
+            if test_index is not None:
+                f.write(f"Replay: seed={self.seed} test={test_index} rule={self.mutator.__class__.__module__}\n")
+            if settings is not None:
+                f.write(f"Planner Settings: {settings or 'defaults'}\n")
             f.write("Original Query:\n" + original_query + "\n")
-            f.write("Mutated Query:\n" + mutated_query + "\n")
+            # Seeded mutants are regenerated from the Replay line instead of stored
+            if test_index is None:
+                f.write("Mutated Query:\n" + mutated_query + "\n")
+            elif mutated_query == original_query:
+                f.write("Mutated Query:\n(original query; compared against its result under default settings)\n")
             f.write("Original Result:\n" + str(original_result) + "\n")
             f.write("Mutated Result:\n" + str(mutated_result) + "\n")
             f.write("Original Plan:\n" + str(original_plan) + "\n")
             f.write("Mutated Plan:\n" + str(mutated_plan) + "\n")
             f.write("=====================\n\n")
+        event_log.dump_recent("bug_events.log", reason="bug report")
 
     def log_system_performance(self):
+        import psutil
+
         cpu_usage = psutil.cpu_percent(interval=1)
         memory_info = psutil.virtual_memory()
-        print(f"[DEBUG] CPU Usage: {cpu_usage}% Memory Usage: {memory_info.percent}%")
+        log.debug("CPU Usage: %s%% Memory Usage: %s%%", cpu_usage, memory_info.percent)
         with open("system_performance_log.txt", "a") as f:
             f.write(f"CPU: {cpu_usage}%, Memory: {memory_info.percent}% at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        if self.server_monitor is not None:
+            try:
+                self.server_monitor.record_backend_memory(self.conn, type(self.mutator).__module__)
+            except Exception as e:
+                self.conn.rollback()
+                log.debug("Backend memory sampling failed: %s", e)
 
 
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", default="campaign.ckpt", help="checkpoint file for this campaign")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--planner-matrix", action="store_true", help="run every test under each planner configuration")
+    args = parser.parse_args()
+
+    event_log.configure(file_level=logging.INFO)
+    event_log.install_crash_dump()
+
     db_config = {
         'dbname': 'postgresDB',
         'user': 'admin',
@@ -176,7 +427,7 @@ if __name__ == "__main__":
         'port': 5432
     }
 
-    fuzzer = DBFuzzer(db_config)
+    fuzzer = DBFuzzer(db_config, planner_matrix=args.planner_matrix)
     target_query = """SELECT
                     name,
                       age,
@@ -184,4 +435,4 @@ if __name__ == "__main__":
                     FROM users
                     WHERE
                       age BETWEEN 20 AND 30;"""
-    fuzzer.fuzz(target_query, iterations=10)
+    fuzzer.fuzz(target_query, iterations=10, checkpoint=Checkpoint(args.checkpoint), resume=args.resume)
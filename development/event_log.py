@@ -0,0 +1,158 @@
+import atexit
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Event logging for the fuzzing loop.
+#
+# - Level checks happen before any formatting, so disabled calls cost a
+#   single integer comparison (use %-style args, never f-strings).
+# - The logger passes DEBUG by default and every record lands in an in-memory
+#   ring buffer, so a bug or crash report shows the full detail leading up to
+#   it; each dump drains the buffer, so consecutive reports never repeat the
+#   same events. The log file and the console have their own, higher levels.
+# - Persistent logs go through a QueueHandler, so the fuzzing thread never
+#   blocks on disk or terminal I/O; a background listener does the writes.
+
+LOGGER_NAME = "fuzzer"
+DEFAULT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+_listener = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep the last `capacity` records in memory, unformatted."""
+
+    def __init__(self, capacity=2000):
+        super().__init__()
+        self.buffer = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        # Formatting is deferred to dump time; only the record is stored.
+        self.buffer.append(record)
+
+    def drain(self):
+        """Remove and return the buffered records, oldest first."""
+        records = []
+        while True:
+            try:
+                records.append(self.buffer.popleft())
+            except IndexError:
+                return records
+
+    def dump(self, stream):
+        """Write out and clear the buffered records; return how many there were."""
+        formatter = self.formatter or logging.Formatter(DEFAULT_FORMAT)
+        records = self.drain()
+        for record in records:
+            stream.write(formatter.format(record) + "\n")
+        stream.flush()
+        return len(records)
+
+
+ring_buffer = RingBufferHandler()
+ring_buffer.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def _not_uncaught(record):
+    # sys.excepthook and threading.excepthook print the traceback themselves
+    return not getattr(record, "uncaught", False)
+
+
+def configure(file_level=logging.INFO, logfile="fuzzer.log", console_level=logging.WARNING, level=logging.DEBUG,
+              ring_capacity=2000):
+    """Set up the ring buffer plus a background writer for `logfile`.
+
+    `level` is what the logger, and so the ring buffer, records; `file_level`
+    and `console_level` filter what is written out as it happens.
+    Safe to call more than once; the previous writer is flushed and replaced.
+    """
+    global _listener
+    root = logging.getLogger(LOGGER_NAME)
+    root.setLevel(level)
+    root.propagate = False
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    ring_buffer.buffer = collections.deque(ring_buffer.buffer, maxlen=ring_capacity)
+    root.addHandler(ring_buffer)
+
+    formatter = logging.Formatter(DEFAULT_FORMAT)
+    sinks = []
+    if logfile:
+        file_handler = logging.FileHandler(logfile)
+        file_handler.setLevel(file_level)
+        file_handler.setFormatter(formatter)
+        sinks.append(file_handler)
+    if console_level is not None:
+        console = logging.StreamHandler(sys.stderr)
+        console.setLevel(console_level)
+        console.addFilter(_not_uncaught)
+        console.setFormatter(formatter)
+        sinks.append(console)
+
+    if sinks:
+        records = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, *sinks, respect_handler_level=True)
+        _listener.start()
+    return root
+
+
+def shutdown():
+    """Flush and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dump_recent(filename="crash_events.log", reason=None):
+    """Append the events recorded since the previous dump to `filename`."""
+    if not ring_buffer.buffer:
+        return
+    with open(filename, "a") as f:
+        f.write(f"\n==== RECENT EVENTS ==== [{time.strftime('%Y-%m-%d %H:%M:%S')}]")
+        f.write(f" {reason}\n" if reason else "\n")
+        ring_buffer.dump(f)
+        f.write("=======================\n")
+
+
+def install_crash_dump(filename="crash_events.log"):
+    """Dump the ring buffer on an uncaught exception, in the main thread or any other."""
+    previous_hook = sys.excepthook
+    previous_thread_hook = threading.excepthook
+
+    def hook(exc_type, exc, tb):
+        get_logger().critical("Uncaught exception", exc_info=(exc_type, exc, tb), extra={"uncaught": True})
+        dump_recent(filename, reason=f"crash: {exc_type.__name__}: {exc}")
+        shutdown()
+        previous_hook(exc_type, exc, tb)
+
+    def thread_hook(args):
+        # The process keeps running, so the background writer stays up
+        if args.exc_type is not SystemExit:
+            name = args.thread.name if args.thread is not None else "unknown"
+            get_logger().critical("Uncaught exception in thread %s", name,
+                                  exc_info=(args.exc_type, args.exc_value, args.exc_traceback),
+                                  extra={"uncaught": True})
+            dump_recent(filename, reason=f"crash in thread {name}: {args.exc_type.__name__}: {args.exc_value}")
+        previous_thread_hook(args)
+
+    sys.excepthook = hook
+    threading.excepthook = thread_hook
+
+
+atexit.register(shutdown)
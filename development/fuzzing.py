@@ -1,45 +1,164 @@
 from database import PostgresManager
 from eet_transformation import PGQueryMutator
+from mismatch_store import MismatchStore
+import seeding
+import event_log
+
+log = event_log.get_logger(__name__)
+
+CHECKPOINT_KIND = "PGFuzzer"
 
 class PGFuzzer:
-    def __init__(self):
-        self.pg = PostgresManager()
+    def __init__(self, spill_path=None, memory_cap=1 << 20, seed=None, session_settings=None, db_config=None):
+        self.pg = PostgresManager(db_config, session_settings=session_settings)
         self.mutator = PGQueryMutator()
-        self.results = []
+        self.seed = seeding.new_campaign_seed() if seed is None else seed
+        # Compact mismatch records; full result rows are spilled to disk
+        self.results = MismatchStore(spill_path, memory_cap)
+        # Third oracle: local evaluation over the fixture tables
+        self.reference = None
+        self.reference_results = MismatchStore(memory_cap=memory_cap)
+        self.skipped_mutants = 0
 
     def _insert_test_data(self):
         """Seed with consistent test data"""
-        self.pg.execute_query("TRUNCATE users, employees RESTART IDENTITY")
-        self.pg.execute_query("""
-            INSERT INTO users (name, age) VALUES
-            ('Alice', 25),   -- Exact boundary for BETWEEN
-            ('Bob', 30),     -- Mid-range
-            ('Charlie', 35)  -- Outside typical range
-        """)
-        self.pg.execute_query("""
-            INSERT INTO employees (name, salary) VALUES
-            ('Dave', 50000),  -- Exact boundary for salary comparisons
-            ('Eve', 50001),   -- Just above threshold
-            ('Frank', 49999)   -- Just below threshold
-        """)
+        self.pg.insert_fixtures()
+
+    def _load_reference(self):
+        """Load the fixture tables into the reference engine (once; fixtures never change)."""
+        from reference import ReferenceEngine
+
+        self.reference = ReferenceEngine()
+        for table in ("users", "employees"):
+            rows = self.pg.execute_query(f"SELECT * FROM {table}") or []
+            columns = [column[0] for column in self.pg.cursor.description]
+            self.reference.load(table, columns, rows)
+
+    def _expected(self, query):
+        from reference import Unsupported
+
+        try:
+            return self._normalize_results(self.reference.evaluate(query))
+        except Unsupported as e:
+            log.debug("Reference engine cannot evaluate query: %s", e)
+            return None
+        except Exception as e:
+            log.debug("Reference engine failed: %s", e)
+            return None
 
     def _normalize_results(self, results):
         """Sort results to handle ordering differences"""
         return sorted(results) if results else None
 
-    def run_test(self, original_query):
+    def run_test(self, original_query, test_index=None):
+        # Retried from scratch (fixtures included) if the connection drops
+        return self.pg.connection.run(self._run_test, original_query, test_index)
+
+    def _run_test(self, original_query, test_index=None):
         self._insert_test_data()
-        mutated_query = self.mutator.mutate(original_query)
-        
+        rng = seeding.test_rng(self.seed, test_index) if test_index is not None else None
+        mutated_query = self.mutator.mutate(original_query, rng)
+        if self.reference is None:
+            self._load_reference()
+
+        # The original is checked against the reference whatever the mutant is
+        expected = self._expected(original_query)
         original_result = self._normalize_results(self.pg.execute_query(original_query))
+        if expected is not None and original_result != expected:
+            self.reference_results.add(original_query, expected, original_query, original_result, test_index)
+            log.warning("PostgreSQL result differs from the reference evaluator!")
+            event_log.dump_recent("bug_events.log", reason="reference mismatch")
+
+        # A mutant whose locally computed result differs from the original's is
+        # not equivalent (a mutator bug), so PostgreSQL need not run it.
+        expected_mutated = self._expected(mutated_query)
+        if expected is not None and expected_mutated is not None and expected != expected_mutated:
+            log.info("Skipping non-equivalent mutant: %s", mutated_query)
+            self.skipped_mutants += 1
+            return
+
         mutated_result = self._normalize_results(self.pg.execute_query(mutated_query))
         
         if original_result != mutated_result:
-            self.results.append({
-                "original": (original_query, original_result),
-                "mutated": (mutated_query, mutated_result)
-            })
-            print("⚠️ Result mismatch found!")
+            self.results.add(original_query, original_result, mutated_query, mutated_result, test_index)
+            log.warning("Result mismatch found!")
+            event_log.dump_recent("bug_events.log", reason="result mismatch")
+
+    def mismatch(self, record):
+        """Load a stored mismatch, regenerating the mutant of seeded tests."""
+        mismatch = self.results.load(record)
+        if mismatch["test"] is not None:
+            original_query = mismatch["original"][0]
+            mutated_query = seeding.regenerate(self.mutator, original_query, self.seed, mismatch["test"])
+            mismatch["mutated"] = (mutated_query, mismatch["mutated"][1])
+        return mismatch
+
+    def run_campaign(self, queries, iterations=10, checkpoint=None, resume=False):
+        """Run `iterations` tests per query, optionally checkpointed.
+
+        Tests are numbered from 0 across the whole campaign (as in
+        DBFuzzer.fuzz, so `main.py replay --test N` means the same test);
+        on resume every test up to the last checkpointed one is skipped and `results` is restored from
+        the checkpoint's result journal. Reference mismatches share the
+        journal (marked "oracle": "reference"); the skip count is in the state.
+        """
+        done = 0
+        if checkpoint is not None:
+            state = checkpoint.load(CHECKPOINT_KIND) if resume else None
+            if state is not None:
+                if state["queries"] != list(queries) or state["iterations"] != iterations:
+                    raise ValueError(f"Checkpoint {checkpoint.path} belongs to a different campaign")
+                done = state["tests_done"]
+                self.seed = state["seed"]
+                self.skipped_mutants = state.get("skipped_mutants", 0)
+                for mismatch in checkpoint.results():
+                    store = self.reference_results if mismatch.get("oracle") == "reference" else self.results
+                    store.add(*mismatch["original"], *mismatch["mutated"], mismatch["test"])
+                log.info("Resuming after test %d", done)
+            else:
+                checkpoint.clear()
+
+        tests_done = 0
+        for query in queries:
+            for _ in range(iterations):
+                test_index = tests_done
+                tests_done += 1
+                if test_index < done:
+                    continue
+                found = len(self.results)
+                found_reference = len(self.reference_results)
+                self.run_test(query, test_index)
+                if checkpoint is None:
+                    continue
+                for record in self.results[found:]:
+                    checkpoint.append_result(self.results.load(record))
+                for record in self.reference_results[found_reference:]:
+                    checkpoint.append_result(dict(self.reference_results.load(record), oracle="reference"))
+                new_results = len(self.results) > found or len(self.reference_results) > found_reference
+                if new_results or checkpoint.due(tests_done):
+                    checkpoint.save(self._campaign_state(queries, iterations, tests_done))
+
+        if checkpoint is not None:
+            checkpoint.save(self._campaign_state(queries, iterations, tests_done))
+            checkpoint.close()
+        self.log_skipped(tests_done - done)
+
+    def log_skipped(self, tests_run):
+        # A mutator that only produces non-equivalent mutants would otherwise
+        # look like a clean run with no mismatches
+        if self.skipped_mutants:
+            log.warning("%d of %d mutants were not equivalent to their original and were skipped",
+                        self.skipped_mutants, tests_run)
+
+    def _campaign_state(self, queries, iterations, tests_done):
+        return {
+            "kind": CHECKPOINT_KIND,
+            "queries": list(queries),
+            "iterations": iterations,
+            "tests_done": tests_done,
+            "seed": self.seed,
+            "skipped_mutants": self.skipped_mutants,
+        }
 
 
     # def run_test(self, original_query):
@@ -65,10 +184,12 @@ class PGFuzzer:
     #     else:
     #         print("✅ Results match")
 
-# Test this phase
-print("\nTesting query comparison...")
-fuzzer = PGFuzzer()
-test_query = "SELECT * FROM users WHERE age >= 25 AND age <= 35"
-fuzzer.run_test(test_query)
-print("Test results:", fuzzer.results)
-fuzzer.pg.close()
\ No newline at end of file
+if __name__ == "__main__":
+    # Test this phase
+    print("\nTesting query comparison...")
+    fuzzer = PGFuzzer()
+    test_query = "SELECT * FROM users WHERE age >= 25 AND age <= 35"
+    fuzzer.run_test(test_query)
+    print("Test results:", fuzzer.results)
+    print("Skipped non-equivalent mutants:", fuzzer.skipped_mutants)
+    fuzzer.pg.close()
@@ -1,27 +1,269 @@
-from monitoring import ResourceMonitor
-from fuzzing import PGFuzzer 
-
-
-def main():
-    # Initialize components
-    fuzzer = PGFuzzer()
-    monitor = ResourceMonitor()
-    
-    # Sample test queries
-    queries = [
-        "SELECT name FROM users WHERE age BETWEEN 20 AND 40",
-        "SELECT * FROM employees WHERE salary > 50000",
-        "SELECT id, name FROM users ORDER BY age DESC"
-    ]
-    
-    # Run fuzzing session
+import argparse
+import importlib
+import sys
+import time
+
+import event_log
+
+# Single entry point: python main.py {fuzz,reduce,bench,replay,distill,containers} ...
+#
+# Nothing heavy is imported here; each subcommand imports what it needs
+# (sqlglot, psycopg2, docker, psutil, numpy) when it runs.
+
+# Rules 3/4 of eet_transformation2 (the only ones a BETWEEN-only query gets)
+# produce CASE branches without THEN, which the validator rejects; rule 1 on
+# plain comparisons yields runnable mutants.
+DEFAULT_RULE = "eet_transformation_rule1"
+DEFAULT_QUERY = "SELECT name, age FROM users WHERE age > 25 AND age < 40"
+
+# Sample test queries for the fixture campaign
+FIXTURE_QUERIES = [
+    "SELECT name FROM users WHERE age BETWEEN 20 AND 40",
+    "SELECT * FROM employees WHERE salary > 50000",
+    "SELECT id, name FROM users ORDER BY age DESC"
+]
+
+
+def _db_config(args):
+    return {
+        'dbname': args.dbname,
+        'user': args.user,
+        'password': args.password,
+        'host': args.host,
+        'port': args.port
+    }
+
+
+def _session_settings(args):
+    """{GUC: value} from repeated --set NAME=VALUE options."""
+    settings = {}
+    for assignment in args.set or []:
+        name, _, value = assignment.partition("=")
+        settings[name.strip()] = value.strip()
+    return settings
+
+
+def _fuzzer(args, **options):
+    module = importlib.import_module(args.rule)
+    return module.DBFuzzer(_db_config(args), seed=args.seed, session_settings=_session_settings(args), **options)
+
+
+def cmd_fuzz(args):
+    from checkpoint import Checkpoint
+
+    checkpoint = Checkpoint(args.checkpoint, every=args.checkpoint_every)
+    if args.fixtures:
+        from fuzzing import PGFuzzer
+        from monitoring import ResourceMonitor
+
+        fuzzer = PGFuzzer(seed=args.seed, session_settings=_session_settings(args), db_config=_db_config(args))
+        monitor = ResourceMonitor()
+        monitor.start_thread()
+        try:
+            fuzzer.run_campaign(FIXTURE_QUERIES, iterations=args.iterations, checkpoint=checkpoint, resume=args.resume)
+            print(f"{len(fuzzer.results)} mismatches, {len(fuzzer.reference_results)} reference mismatches, "
+                  f"{fuzzer.skipped_mutants} non-equivalent mutants skipped")
+        finally:
+            monitor.stop()
+            monitor.save_report()
+            fuzzer.pg.close()
+            fuzzer.results.close()
+        return
+
+    server_monitor = None
+    if args.server_stats:
+        from server_monitor import ServerMonitor
+
+        server_monitor = ServerMonitor(_db_config(args), path=args.server_stats).start()
+    fuzzer = _fuzzer(args, validate=not args.no_validate, planner_matrix=args.planner_matrix,
+                     server_monitor=server_monitor)
+    try:
+        fuzzer.fuzz(args.query, iterations=args.iterations, checkpoint=checkpoint, resume=args.resume)
+        print(f"Campaign seed {fuzzer.seed}: {fuzzer.bugs_found} bugs in {args.iterations} tests")
+        if fuzzer.bug_tests:
+            print(f"Bug tests (replay with --seed {fuzzer.seed} --test N): {', '.join(map(str, fuzzer.bug_tests))}")
+    finally:
+        fuzzer.conn.close()
+        if server_monitor is not None:
+            server_monitor.stop()
+            for (rule, role), cost in server_monitor.attribution():
+                print(f"{rule} {role}: {cost['total_exec_time']:.1f} ms in {cost['calls']:.0f} calls, "
+                      f"{cost['shared_blks_hit']:.0f} buffer hits, {cost['shared_blks_read']:.0f} reads")
+            for spent, query_id, label, query in server_monitor.most_expensive(5):
+                source = f"{label['rule']} {label['role']} tests {label['tests']}" if label else "unregistered"
+                print(f"  {spent:.1f} ms  queryid {query_id} ({source}): {' '.join(query.split())}")
+
+
+def cmd_replay(args):
+    module = importlib.import_module(args.rule)
+    if not args.execute:
+        import seeding
+
+        print(seeding.regenerate(module.PGQueryMutator(), args.query, args.seed, args.test))
+        return
+    fuzzer = _fuzzer(args)
+    try:
+        print(fuzzer.mutant(args.query, args.test))
+        print("Bug reproduced" if fuzzer.run_test(args.query, args.test) else "No inconsistency")
+    finally:
+        fuzzer.conn.close()
+
+
+def cmd_reduce(args):
+    from reducer import reduce_query
+
+    fuzzer = _fuzzer(args, validate=False)
+    mutated_query = args.mutant or fuzzer.mutant(args.query, args.test)
+    original_result = sorted(fuzzer.execute_query(args.query), key=repr)
+
+    def still_fails(sql):
+        try:
+            return sorted(fuzzer.execute_query(sql), key=repr) != original_result
+        except Exception:
+            return False
+
     try:
-        for query in queries:
-            for _ in range(10):  # 10 iterations per query
-                fuzzer.run_test(query)
-        monitor.save_report()
+        if not still_fails(mutated_query):
+            print("Mutant does not reproduce a mismatch", file=sys.stderr)
+            sys.exit(1)
+        print(reduce_query(mutated_query, still_fails, max_attempts=args.max_attempts))
     finally:
-        fuzzer.pg.close()
+        fuzzer.conn.close()
+
+
+def cmd_bench(args):
+    import seeding
+
+    module = importlib.import_module(args.rule)
+    mutator = module.PGQueryMutator()
+    started = time.perf_counter()
+    for test_index in range(args.iterations):
+        seeding.regenerate(mutator, args.query, args.seed or 0, test_index)
+    elapsed = time.perf_counter() - started
+    print(f"mutate: {args.iterations / elapsed:.0f} mutants/s ({elapsed / args.iterations * 1e6:.0f} us each)")
+
+    if args.db:
+        fuzzer = _fuzzer(args, planner_matrix=args.planner_matrix)
+        try:
+            started = time.perf_counter()
+            for test_index in range(args.iterations):
+                fuzzer.run_test(args.query, test_index)
+            elapsed = time.perf_counter() - started
+            print(f"tests: {args.iterations / elapsed:.1f} tests/s ({elapsed / args.iterations * 1e3:.1f} ms each)")
+        finally:
+            fuzzer.conn.close()
+
+
+def cmd_distill(args):
+    from distill import distill, read_corpus, write_corpus
+
+    queries = read_corpus(args.corpus)
+    fuzzer = _fuzzer(args, validate=False)
+    try:
+        chosen = distill(fuzzer, queries, samples=args.samples, planner_matrix=args.planner_matrix)
+    finally:
+        fuzzer.conn.close()
+    write_corpus(args.output, chosen)
+    print(f"Kept {len(chosen)} of {len(queries)} seeds in {args.output}")
+
+
+def cmd_containers(args):
+    import containers
+
+    if args.action == "start":
+        container = containers.start_postgres_container(name=args.name, port=args.port)
+        containers.load_fixtures(dict(containers.CONTAINER_DB_CONFIG, port=args.port))
+        print(f"Container ID: {container.id} (schema and fixtures loaded)")
+    else:
+        containers.stop_postgres_container(name=args.name)
+        print("Container cleaned up!")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="EET fuzzer for PostgreSQL")
+    parser.add_argument("--log-level", default="INFO", help="level written to the log file; the ring buffer always keeps DEBUG")
+    parser.add_argument("--log-file", default="fuzzer.log")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def with_db(p):
+        p.add_argument("--dbname", default="postgresDB")
+        p.add_argument("--user", default="admin")
+        p.add_argument("--password", default="admin")
+        p.add_argument("--host", default="localhost")
+        p.add_argument("--port", type=int, default=5432)
+        p.add_argument("--set", action="append", metavar="NAME=VALUE",
+                       help="session setting applied on every (re)connect, e.g. statement_timeout=5s; "
+                            "planner matrix entries that do not name it keep it")
+
+    def with_test(p):
+        p.add_argument("--rule", default=DEFAULT_RULE, help="module providing PGQueryMutator/DBFuzzer")
+        p.add_argument("--query", default=DEFAULT_QUERY)
+        p.add_argument("--seed", type=int, help="campaign seed")
+
+    fuzz = sub.add_parser("fuzz", help="run a fuzzing campaign")
+    with_db(fuzz)
+    with_test(fuzz)
+    fuzz.add_argument("--iterations", type=int, default=10)
+    fuzz.add_argument("--fixtures", action="store_true", help="PGFuzzer campaign over the sample fixture queries")
+    fuzz.add_argument("--checkpoint", default="campaign.ckpt")
+    fuzz.add_argument("--checkpoint-every", type=int, default=10)
+    fuzz.add_argument("--resume", action="store_true")
+    fuzz.add_argument("--planner-matrix", action="store_true")
+    fuzz.add_argument("--no-validate", action="store_true", help="send mutants to the server without pre-flight checks")
+    fuzz.add_argument("--server-stats", metavar="FILE", help="sample server-side statistics into FILE (JSON lines)")
+    fuzz.set_defaults(func=cmd_fuzz)
+
+    replay = sub.add_parser("replay", help="regenerate (and optionally re-run) one test")
+    with_db(replay)
+    with_test(replay)
+    replay.add_argument("--test", type=int, required=True)
+    replay.add_argument("--execute", action="store_true")
+    replay.set_defaults(func=cmd_replay)
+
+    reduce = sub.add_parser("reduce", help="shrink a bug-triggering mutant")
+    with_db(reduce)
+    with_test(reduce)
+    reduce.add_argument("--test", type=int, help="test index to regenerate the mutant from")
+    reduce.add_argument("--mutant", help="mutant SQL, instead of --seed/--test")
+    reduce.add_argument("--max-attempts", type=int, default=500)
+    reduce.set_defaults(func=cmd_reduce)
+
+    bench = sub.add_parser("bench", help="measure mutation and test throughput")
+    with_db(bench)
+    with_test(bench)
+    bench.add_argument("--iterations", type=int, default=1000)
+    bench.add_argument("--db", action="store_true", help="also time full tests against the database")
+    bench.add_argument("--planner-matrix", action="store_true")
+    bench.set_defaults(func=cmd_bench)
+
+    distill = sub.add_parser("distill", help="keep the smallest seed set that preserves plan and rule coverage")
+    with_db(distill)
+    distill.add_argument("corpus", help="file of ';'-separated seed queries")
+    distill.add_argument("--output", default="distilled_corpus.sql")
+    distill.add_argument("--rule", default=DEFAULT_RULE, help="module providing PGQueryMutator/DBFuzzer")
+    distill.add_argument("--seed", type=int, default=0,
+                         help="campaign seed for the sampled mutants (fixed, so runs keep the same seeds)")
+    distill.add_argument("--samples", type=int, default=8, help="mutants per seed used to find applicable rules")
+    distill.add_argument("--planner-matrix", action="store_true", help="collect plan shapes under every planner configuration")
+    distill.set_defaults(func=cmd_distill)
+
+    containers = sub.add_parser("containers", help="start or stop a PostgreSQL container")
+    containers.add_argument("action", choices=["start", "stop"])
+    containers.add_argument("--name", default="pg_fuzzer")
+    containers.add_argument("--port", type=int, default=5432)
+    containers.set_defaults(func=cmd_containers)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "reduce" and args.mutant is None and (args.seed is None or args.test is None):
+        build_parser().error("reduce needs --mutant or both --seed and --test")
+    if args.command == "replay" and args.seed is None:
+        build_parser().error("replay needs --seed")
+    event_log.configure(file_level=args.log_level.upper(), logfile=args.log_file)
+    event_log.install_crash_dump()
+    args.func(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+class MismatchRecord:
+    """Compact in-memory summary of one result mismatch.
+
+    The full result rows live in the store's spill file at
+    [offset, offset + length). Mismatches from seeded tests keep only the
+    test index; their mutant text is regenerated on demand.
+    """
+
+    __slots__ = ("original_id", "mutated_id", "test_index", "original_rows", "mutated_rows",
+                 "original_digest", "mutated_digest", "offset", "length")
+
+    def __init__(self, original_id, mutated_id, test_index, original_rows, mutated_rows,
+                 original_digest, mutated_digest, offset, length):
+        self.original_id = original_id
+        self.mutated_id = mutated_id
+        self.test_index = test_index
+        self.original_rows = original_rows
+        self.mutated_rows = mutated_rows
+        self.original_digest = original_digest
+        self.mutated_digest = mutated_digest
+        self.offset = offset
+        self.length = length
+
+    def __repr__(self):
+        mutant = f"test {self.test_index}" if self.mutated_id is None else f"q{self.mutated_id}"
+        return (f"MismatchRecord(q{self.original_id} -> {mutant}, "
+                f"rows {self.original_rows} vs {self.mutated_rows}, "
+                f"{self.original_digest} vs {self.mutated_digest})")
+
+
+def result_digest(rows):
+    return hashlib.blake2b(repr(rows).encode(), digest_size=8).hexdigest()
+
+
+class MismatchStore:
+    """Mismatches as compact records, full payloads spilled to disk.
+
+    Query texts are interned to integer ids. Pickled payloads are buffered in
+    memory until `memory_cap` bytes have accumulated, then appended to the
+    spill file (an anonymous temporary file unless `spill_path` is given).
+    """
+
+    def __init__(self, spill_path=None, memory_cap=1 << 20):
+        self.spill_path = spill_path
+        self.memory_cap = memory_cap
+        self.records = []
+        self.query_ids = {}
+        self.queries = []
+        self._spill = None
+        self._spilled = 0
+        self._buffer = []
+        self._buffered = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __repr__(self):
+        return f"MismatchStore({len(self.records)} mismatches, {self._spilled + self._buffered} payload bytes)"
+
+    def query_id(self, query):
+        if query not in self.query_ids:
+            self.query_ids[query] = len(self.queries)
+            self.queries.append(query)
+        return self.query_ids[query]
+
+    def add(self, original_query, original_result, mutated_query, mutated_result, test_index=None):
+        payload = pickle.dumps((original_result, mutated_result), protocol=pickle.HIGHEST_PROTOCOL)
+        record = MismatchRecord(
+            self.query_id(original_query),
+            self.query_id(mutated_query) if test_index is None else None,
+            test_index,
+            len(original_result) if original_result else 0,
+            len(mutated_result) if mutated_result else 0,
+            result_digest(original_result),
+            result_digest(mutated_result),
+            self._spilled + self._buffered,
+            len(payload),
+        )
+        self._buffer.append(payload)
+        self._buffered += len(payload)
+        if self._buffered > self.memory_cap:
+            self.flush()
+        self.records.append(record)
+        return record
+
+    def load(self, record):
+        """Full mismatch in the shape PGFuzzer.results used to hold.
+
+        The mutated query is None for seeded tests; see PGFuzzer.mismatch().
+        """
+        if record.offset >= self._spilled:
+            position = self._spilled
+            for data in self._buffer:
+                if position == record.offset:
+                    break
+                position += len(data)
+        else:
+            self._spill.seek(record.offset)
+            data = self._spill.read(record.length)
+            self._spill.seek(0, os.SEEK_END)
+        original_result, mutated_result = pickle.loads(data)
+        return {
+            "original": (self.queries[record.original_id], original_result),
+            "mutated": (None if record.mutated_id is None else self.queries[record.mutated_id], mutated_result),
+            "test": record.test_index,
+        }
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._spill is None:
+            self._spill = open(self.spill_path, "w+b") if self.spill_path else tempfile.TemporaryFile()
+        self._spill.seek(0, os.SEEK_END)
+        for payload in self._buffer:
+            self._spill.write(payload)
+        self._spill.flush()
+        self._spilled += self._buffered
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
@@ -1,19 +1,41 @@
-import psutil
 import csv
+import threading
 import time
 
 class ResourceMonitor:
     def __init__(self):
         self.metrics = []
+        self.running = threading.Event()
+        self.thread = None
     
-    def start_monitoring(self):
-        while True:
+    def start_monitoring(self, interval=1):
+        """Sample in the calling thread until stop() is called."""
+        self.running.set()
+        self._run(interval)
+
+    def _run(self, interval):
+        import psutil
+
+        while self.running.is_set():
             self.metrics.append((
                 time.time(),
                 psutil.cpu_percent(),
                 psutil.virtual_memory().percent
             ))
-            time.sleep(1)
+            time.sleep(interval)
+
+    def start_thread(self, interval=1):
+        # Set before the thread starts, so an early stop() is never lost
+        self.running.set()
+        self.thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
 
     def save_report(self, filename="usage.csv"):
         with open(filename, "w", newline="") as f:
@@ -21,12 +43,12 @@ class ResourceMonitor:
             writer.writerow(["Timestamp", "CPU%", "Memory%"])
             writer.writerows(self.metrics)
 
-# Test this phase
-print("\nTesting resource monitoring...")
-monitor = ResourceMonitor()
-# Run in separate thread for real usage
-for _ in range(3):
-    monitor.start_monitoring()
-    time.sleep(1)
-monitor.save_report()
-print("Saved monitoring data")
\ No newline at end of file
+if __name__ == "__main__":
+    # Test this phase
+    print("\nTesting resource monitoring...")
+    monitor = ResourceMonitor()
+    monitor.start_thread()
+    time.sleep(3)
+    monitor.stop()
+    monitor.save_report()
+    print("Saved monitoring data")
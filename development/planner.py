@@ -0,0 +1,125 @@
+from sqlglot import parse_one, exp
+
+# Planner configurations to run each test under. Every entry is applied with
+# SET LOCAL inside the test's transaction; settings not named in an entry are
+# put back to their session values, so entries do not leak into each other.
+# A plain `SET LOCAL ... TO DEFAULT` would also discard a session setting of
+# the same name (main.py --set), hence the explicit baseline.
+PLANNER_MATRIX = [
+    {},
+    {"enable_seqscan": "off"},
+    {"enable_indexscan": "off", "enable_bitmapscan": "off"},
+    {"enable_hashjoin": "off", "enable_mergejoin": "off"},
+    {"enable_nestloop": "off"},
+    {
+        "max_parallel_workers_per_gather": "4",
+        "parallel_setup_cost": "0",
+        "parallel_tuple_cost": "0",
+        "min_parallel_table_scan_size": "0",
+    },
+]
+
+PLANNER_SETTINGS = sorted({name for settings in PLANNER_MATRIX for name in settings})
+
+
+def settings_sql(settings, baseline=None):
+    """One batch of SET LOCAL statements for `settings` (a PLANNER_MATRIX entry).
+
+    Settings the entry does not name go back to `baseline` (the connection's
+    session settings) if set there, else to the server default.
+    """
+    baseline = baseline or {}
+
+    def assignment(name):
+        if name in settings:
+            return f"SET LOCAL {name} = {settings[name]}"
+        if name in baseline:
+            value = str(baseline[name]).replace("'", "''")
+            return f"SET LOCAL {name} = '{value}'"
+        return f"SET LOCAL {name} TO DEFAULT"
+
+    return "; ".join(assignment(name) for name in PLANNER_SETTINGS)
+
+
+def plan_signature(plan):
+    """Shape of an EXPLAIN (FORMAT JSON) plan, e.g. 'Hash Join(Seq Scan,Hash(Seq Scan))'.
+
+    Accepts the row get_execution_plan() returns or the plan dict itself.
+    """
+    if isinstance(plan, (tuple, list)):
+        plan = plan[0]
+        if isinstance(plan, list):
+            plan = plan[0]
+    if "Plan" in plan:
+        plan = plan["Plan"]
+    node = plan["Node Type"]
+    if plan.get("Join Type"):
+        node += f"[{plan['Join Type']}]"
+    children = plan.get("Plans", [])
+    if not children:
+        return node
+    return node + "(" + ",".join(plan_signature(child) for child in children) + ")"
+
+
+def base_tables(select):
+    """{alias: table} of the base tables `select` reads directly.
+
+    Derived tables and CTE references map to None: their columns are not
+    columns of any table that could be indexed.
+    """
+    ctes = {cte.alias_or_name for cte in select.find_all(exp.CTE)}
+    source = select.args.get("from") or select.args.get("from_")
+    relations = ([source.this] if source is not None else []) + [join.this for join in select.args.get("joins") or []]
+    tables = {}
+    for relation in relations:
+        if isinstance(relation, exp.Table) and not (relation.name in ctes and not relation.db):
+            tables[relation.alias_or_name] = relation.name
+        else:
+            tables[relation.alias_or_name] = None
+    return tables
+
+
+def indexable_columns(query):
+    """(table, column) pairs a query filters on, for supporting indexes.
+
+    Only columns of the outer query's base tables count; a column read from a
+    derived table or CTE, or one that cannot be resolved, is skipped.
+    """
+    tree = parse_one(query, dialect="postgres")
+    if not isinstance(tree, exp.Select):
+        return []
+    tables = base_tables(tree)
+    pairs = set()
+    for clause in ("where", "having"):
+        if tree.args.get(clause) is None:
+            continue
+        for column in tree.args[clause].find_all(exp.Column):
+            if column.find_ancestor(exp.Select) is not tree:
+                continue  # inside a subquery, with its own scope
+            if column.table:
+                table = tables.get(column.table)
+            else:
+                table = next(iter(tables.values())) if len(tables) == 1 else None
+            if table is not None:
+                pairs.add((table, column.name))
+    return sorted(pairs)
+
+
+if __name__ == "__main__":
+    # Regression checks: only base-table columns are offered for indexing
+    cases = [
+        ("SELECT name FROM users WHERE age > 25 AND age < 40", [("users", "age")]),
+        ("SELECT * FROM users u JOIN employees e ON u.id = e.id WHERE u.age > 1 AND e.salary < 5",
+         [("employees", "salary"), ("users", "age")]),
+        ("SELECT * FROM (SELECT age AS a FROM users) s WHERE s.a > 1", []),
+        ("SELECT * FROM (SELECT age AS a FROM users) s WHERE a > 1", []),
+        ("WITH t AS (SELECT * FROM users) SELECT * FROM t WHERE age > 1", []),
+        ("SELECT * FROM users WHERE id IN (SELECT id FROM employees WHERE salary > 1)", [("users", "id")]),
+    ]
+    failures = 0
+    for sql, expected in cases:
+        got = indexable_columns(sql)
+        status = "ok" if got == expected else "FAILED"
+        failures += status == "FAILED"
+        print(f"{status:6} {sql}  -> {got}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,38 @@
+import functools
+
+from sqlglot import exp
+
+# Tautology/contradiction predicates shared by the EET rules.
+#
+# Every wrapper predicate the mutators generate is built around an `n = m`
+# comparison of two literals in 0..10, so there are only 121 of each kind.
+# Each is rendered to PostgreSQL text once, on first use, and spliced into
+# mutants as a single Var node that the generator prints verbatim: a mutation
+# allocates one node instead of building and later rendering an 11-node tree.
+# Nothing shared is put into a tree, so no cached object is ever re-parented.
+
+VALUES = range(11)
+
+
+def build_true(p):
+    """p AND (NOT p AND p IS NULL)"""
+    return exp.And(this=p, expression=exp.And(this=p.copy().not_(), expression=exp.Is(this=p.copy(), expression=exp.Null())))
+
+
+def build_false(p):
+    """p AND (NOT p AND NOT p IS NULL)"""
+    not_null_expr = exp.Not(this=exp.Is(this=p.copy(), expression=exp.Null()))
+    return exp.And(this=p, expression=exp.And(this=p.copy().not_(), expression=not_null_expr))
+
+
+@functools.lru_cache(maxsize=None)
+def predicate_sql(kind, n, m):
+    """Text of the `kind` ("true" or "false") wrapper around `n = m`."""
+    build = build_true if kind == "true" else build_false
+    p = exp.EQ(this=exp.Literal.number(n), expression=exp.Literal.number(m))
+    return build(p).sql(dialect="postgres")
+
+
+def fragment(kind, n, m):
+    """A fresh node that renders as predicate_sql(kind, n, m)."""
+    return exp.Var(this=predicate_sql(kind, n, m))
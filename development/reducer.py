@@ -0,0 +1,49 @@
+from sqlglot import parse_one, exp
+
+import event_log
+
+log = event_log.get_logger(__name__)
+
+# Greedy AST reduction of a bug-triggering mutant: repeatedly replace a node by
+# one of its simpler parts (a paren by its content, AND/OR by either side, NOT
+# by its operand, CASE by one of its values) and keep the change whenever the
+# caller's oracle still reports the bug.
+
+
+def _simplifications(node):
+    if isinstance(node, exp.Paren):
+        return [node.this]
+    if isinstance(node, (exp.And, exp.Or)):
+        return [node.this, node.expression]
+    if isinstance(node, exp.Not):
+        return [node.this]
+    if isinstance(node, exp.Case):
+        values = [branch.args["true"] for branch in node.args.get("ifs", []) if branch.args.get("true") is not None]
+        if node.args.get("default") is not None:
+            values.append(node.args["default"])
+        return values
+    return []
+
+
+def reduce_query(query, still_fails, max_attempts=500):
+    """Smallest variant of `query` found for which `still_fails(sql)` is true."""
+    tree = parse_one(query, dialect="postgres")
+    attempts = 0
+    changed = True
+    while changed and attempts < max_attempts:
+        changed = False
+        for position, node in enumerate(tree.walk()):
+            for option in range(len(_simplifications(node))):
+                candidate = tree.copy()
+                target = list(candidate.walk())[position]
+                target.replace(_simplifications(target)[option].copy())
+                sql = candidate.sql(dialect="postgres")
+                attempts += 1
+                if still_fails(sql):
+                    log.info("Reduced to: %s", sql)
+                    tree = candidate
+                    changed = True
+                    break
+            if changed or attempts >= max_attempts:
+                break
+    return tree.sql(dialect="postgres", pretty=True)
@@ -0,0 +1,258 @@
+import numbers
+
+import numpy as np
+from sqlglot import parse_one, exp
+
+# Local reference engine for fixture-sized tables.
+#
+# Each table is loaded once into NumPy column arrays; WHERE predicates are
+# evaluated over the sqlglot AST as vectorised masks. Every intermediate value
+# is a pair (values, nulls) of equal-length arrays, which gives SQL's
+# three-valued logic: a boolean is TRUE where `values & ~nulls`, FALSE where
+# `~values & ~nulls` and UNKNOWN where `nulls`.
+#
+# Anything outside the supported subset raises Unsupported, and callers fall
+# back to trusting PostgreSQL alone.
+
+COMPARISONS = {
+    exp.EQ: np.equal,
+    exp.NEQ: np.not_equal,
+    exp.GT: np.greater,
+    exp.GTE: np.greater_equal,
+    exp.LT: np.less,
+    exp.LTE: np.less_equal,
+}
+ARITHMETIC = {
+    exp.Add: np.add,
+    exp.Sub: np.subtract,
+    exp.Mul: np.multiply,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class Column:
+    def __init__(self, values):
+        self.objects = np.array(values, dtype=object)
+        self.nulls = np.array([value is None for value in values], dtype=bool)
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, bool) for value in present):
+            self.kind = "boolean"
+            self.values = np.array([bool(value) for value in values], dtype=bool)
+        elif all(isinstance(value, numbers.Number) or type(value).__name__ == "Decimal" for value in present):
+            self.kind = "number"
+            self.values = np.array([float(value) if value is not None else 0.0 for value in values])
+        else:
+            self.kind = "text"
+            self.values = np.array([str(value) if value is not None else "" for value in values], dtype=object)
+
+
+class Table:
+    def __init__(self, names, rows):
+        self.names = list(names)
+        self.size = len(rows)
+        self.columns = {name: Column([row[i] for row in rows]) for i, name in enumerate(self.names)}
+
+
+class ReferenceEngine:
+    def __init__(self):
+        self.tables = {}
+
+    def load(self, name, columns, rows):
+        self.tables[name] = Table(columns, rows)
+
+    def evaluate(self, sql):
+        """Rows the query should return (unordered), or raise Unsupported."""
+        tree = parse_one(sql, dialect="postgres") if isinstance(sql, str) else sql
+        if not isinstance(tree, exp.Select):
+            raise Unsupported("not a SELECT")
+        for arg in ("joins", "group", "having", "limit", "offset", "distinct", "with"):
+            if tree.args.get(arg):
+                raise Unsupported(arg)
+        source = tree.args.get("from") or tree.args.get("from_")
+        if source is None or not isinstance(source.this, exp.Table) or source.this.name not in self.tables:
+            raise Unsupported("FROM must be one loaded table")
+        table = self.tables[source.this.name]
+
+        if tree.args.get("where") is not None:
+            values, nulls = self._eval(tree.args["where"].this, table)
+            if values.dtype != bool:
+                raise Unsupported("WHERE is not boolean")
+            selected = np.flatnonzero(values & ~nulls)
+        else:
+            selected = np.arange(table.size)
+
+        outputs = []
+        for projection in tree.expressions:
+            if isinstance(projection, exp.Star):
+                outputs.extend(table.columns[name].objects for name in table.names)
+                continue
+            node = projection.this if isinstance(projection, exp.Alias) else projection
+            if isinstance(node, exp.Column):
+                outputs.append(self._column(node, table).objects)
+            else:
+                values, nulls = self._eval(node, table)
+                outputs.append(np.where(nulls, None, values.astype(object)))
+        return [tuple(output[i] for output in outputs) for i in selected]
+
+    def _column(self, node, table):
+        if node.name not in table.columns:
+            raise Unsupported(f"unknown column {node.name}")
+        return table.columns[node.name]
+
+    def _eval(self, node, table):
+        n = table.size
+        if isinstance(node, exp.Paren):
+            return self._eval(node.this, table)
+        if isinstance(node, exp.Column):
+            column = self._column(node, table)
+            return column.values, column.nulls
+        if isinstance(node, exp.Null):
+            return np.zeros(n, dtype=bool), np.ones(n, dtype=bool)
+        if isinstance(node, exp.Boolean):
+            return np.full(n, node.this, dtype=bool), np.zeros(n, dtype=bool)
+        if isinstance(node, exp.Literal):
+            if node.is_string:
+                return np.full(n, node.this, dtype=object), np.zeros(n, dtype=bool)
+            return np.full(n, float(node.this)), np.zeros(n, dtype=bool)
+
+        if type(node) in COMPARISONS:
+            if isinstance(node.expression, exp.Is):
+                # PostgreSQL reads `a = b IS NULL` as `(a = b) IS NULL`
+                inner = type(node)(this=node.this, expression=node.expression.this)
+                return self._eval(exp.Is(this=exp.Paren(this=inner), expression=exp.Null(),
+                                         negate=node.expression.args.get("negate")), table)
+            return self._compare(COMPARISONS[type(node)], node.this, node.expression, table)
+        if isinstance(node, exp.Between):
+            low = self._compare(np.greater_equal, node.this, node.args["low"], table)
+            high = self._compare(np.less_equal, node.this, node.args["high"], table)
+            return _and(low, high)
+        if isinstance(node, exp.And):
+            return _and(self._bool(node.this, table), self._bool(node.expression, table))
+        if isinstance(node, exp.Or):
+            return _or(self._bool(node.this, table), self._bool(node.expression, table))
+        if isinstance(node, exp.Not):
+            values, nulls = self._bool(node.this, table)
+            return ~values, nulls
+        if isinstance(node, exp.Is):
+            if not isinstance(node.expression, exp.Null):
+                raise Unsupported("IS other than IS NULL")
+            _, nulls = self._eval(node.this, table)
+            # sqlglot parses `x IS NOT NULL` as Is(negate=True)
+            return (~nulls if node.args.get("negate") else nulls.copy()), np.zeros(n, dtype=bool)
+        if isinstance(node, exp.Case):
+            return self._case(node, table)
+        if type(node) in ARITHMETIC:
+            left, left_nulls = self._eval(node.this, table)
+            right, right_nulls = self._eval(node.expression, table)
+            if left.dtype != float or right.dtype != float:
+                raise Unsupported("non-numeric arithmetic")
+            return ARITHMETIC[type(node)](left, right), left_nulls | right_nulls
+        raise Unsupported(type(node).__name__)
+
+    def _bool(self, node, table):
+        values, nulls = self._eval(node, table)
+        if values.dtype != bool:
+            raise Unsupported("expected a boolean operand")
+        return values, nulls
+
+    def _compare(self, op, left_node, right_node, table):
+        left, left_nulls = self._eval(left_node, table)
+        right, right_nulls = self._eval(right_node, table)
+        if left.dtype != right.dtype:
+            left, right = _coerce(left, right)
+        if left.dtype == object and op not in (np.equal, np.not_equal):
+            # Text ordering depends on the server's collation
+            raise Unsupported("ordered text comparison")
+        return op(left, right).astype(bool), left_nulls | right_nulls
+
+    def _case(self, node, table):
+        n = table.size
+        decided = np.zeros(n, dtype=bool)
+        branches = []
+        for branch in node.args.get("ifs", []):
+            if not isinstance(branch, exp.If) or branch.args.get("true") is None:
+                raise Unsupported("malformed CASE")
+            condition, condition_nulls = self._bool(branch.this, table)
+            taken = condition & ~condition_nulls & ~decided
+            branches.append((taken, self._eval(branch.args["true"], table)))
+            decided |= taken
+        if node.args.get("default") is not None:
+            branches.append((~decided, self._eval(node.args["default"], table)))
+        else:
+            branches.append((~decided, (np.zeros(n, dtype=bool), np.ones(n, dtype=bool))))
+
+        kinds = {values.dtype for _, (values, nulls) in branches if not nulls.all()}
+        if len(kinds) > 1:
+            raise Unsupported("CASE branches of different types")
+        dtype = kinds.pop() if kinds else bool
+        result = np.zeros(n, dtype=dtype) if dtype != object else np.full(n, "", dtype=object)
+        result_nulls = np.ones(n, dtype=bool)
+        for taken, (values, nulls) in branches:
+            if values.dtype == dtype:
+                result[taken] = values[taken]
+            result_nulls[taken] = nulls[taken]
+        return result, result_nulls
+
+
+def _coerce(left, right):
+    """Resolve a quoted literal against a numeric operand, as PostgreSQL does."""
+    if left.dtype == object and right.dtype == float:
+        return _to_number(left), right
+    if right.dtype == object and left.dtype == float:
+        return left, _to_number(right)
+    raise Unsupported("mixed-type comparison")
+
+
+def _to_number(values):
+    try:
+        return values.astype(float)
+    except ValueError:
+        raise Unsupported("non-numeric literal")
+
+
+def _and(a, b):
+    a_values, a_nulls = a
+    b_values, b_nulls = b
+    true = (a_values & ~a_nulls) & (b_values & ~b_nulls)
+    false = (~a_values & ~a_nulls) | (~b_values & ~b_nulls)
+    return true, ~(true | false)
+
+
+def _or(a, b):
+    a_values, a_nulls = a
+    b_values, b_nulls = b
+    true = (a_values & ~a_nulls) | (b_values & ~b_nulls)
+    false = (~a_values & ~a_nulls) & (~b_values & ~b_nulls)
+    return true, ~(true | false)
+
+
+if __name__ == "__main__":
+    # Regression checks on the fixture shape, with a NULL row
+    engine = ReferenceEngine()
+    engine.load("users", ["id", "name", "age"], [
+        (1, "Alice", 25), (2, "Bob", 30), (3, "Charlie", 35), (4, "Dora", None), (5, "Eve", 40),
+    ])
+    cases = [
+        ("SELECT id FROM users WHERE age IS NULL", [(4,)]),
+        ("SELECT id FROM users WHERE age IS NOT NULL", [(1,), (2,), (3,), (5,)]),
+        ("SELECT id FROM users WHERE NOT age IS NULL", [(1,), (2,), (3,), (5,)]),
+        ("SELECT id FROM users WHERE NOT age IS NOT NULL", [(4,)]),
+        ("SELECT id FROM users WHERE age > 30", [(3,), (5,)]),
+        ("SELECT id FROM users WHERE NOT age > 30", [(1,), (2,)]),
+        ("SELECT id FROM users WHERE age > 30 OR age IS NULL", [(3,), (4,), (5,)]),
+        ("SELECT id FROM users WHERE NOT (age > 30 AND age < 40)", [(1,), (2,), (5,)]),
+        ("SELECT id FROM users WHERE age = 25 IS NULL", [(4,)]),
+        ("SELECT id FROM users WHERE age = 25 IS NOT NULL", [(1,), (2,), (3,), (5,)]),
+        ("SELECT id FROM users WHERE 1 = 1 AND (NOT 1 = 1 AND NOT 1 = 1 IS NULL) OR age < 30", [(1,)]),
+        ("SELECT id FROM users WHERE age BETWEEN (CASE WHEN 1 = 2 THEN 99 ELSE 25 END) AND 30", [(1,), (2,)]),
+    ]
+    failures = 0
+    for sql, expected in cases:
+        rows = sorted(engine.evaluate(sql))
+        status = "ok" if rows == expected else "FAILED"
+        failures += status == "FAILED"
+        print(f"{status:6} {sql}" + ("" if rows == expected else f"  (got {rows})"))
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,25 @@
+import hashlib
+import random
+
+# Every test draws its randomness from its own random.Random, seeded from
+# (campaign seed, test index). A mutant can therefore be regenerated from those
+# two integers instead of being stored, and workers can split a campaign by
+# index range without sharing RNG state.
+
+
+def test_seed(campaign_seed, test_index):
+    digest = hashlib.blake2b(f"{campaign_seed}:{test_index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def test_rng(campaign_seed, test_index):
+    return random.Random(test_seed(campaign_seed, test_index))
+
+
+def new_campaign_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def regenerate(mutator, query, campaign_seed, test_index):
+    """Rebuild the mutant that test `test_index` of a campaign produced."""
+    return mutator.mutate(query, test_rng(campaign_seed, test_index))
@@ -0,0 +1,185 @@
+import collections
+import json
+import threading
+import time
+
+import event_log
+
+log = event_log.get_logger(__name__)
+
+# Database-side resource sampling.
+#
+# A background thread with its own connection periodically samples
+# pg_stat_statements, pg_stat_activity, pg_stat_database and (PostgreSQL 16+)
+# pg_stat_io, appending each sample as one JSON line to `path`. The fuzzer
+# registers the query identifier of every statement it runs (from EXPLAIN
+# VERBOSE) together with the rule/test that produced it, so statement costs
+# can be attributed to rules and mutants. The first registration of each
+# query id is written to the same file as a "query_label" record, so the
+# statements rows can be attributed offline too.
+
+STATEMENTS_SQL = """
+    SELECT queryid, calls, total_exec_time, rows, shared_blks_hit, shared_blks_read,
+           temp_blks_written, left(query, 200)
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+ACTIVITY_SQL = """
+    SELECT pid, backend_type, state, wait_event_type, wait_event,
+           extract(epoch FROM now() - query_start), left(query, 200)
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND pid <> pg_backend_pid()
+"""
+DATABASE_SQL = """
+    SELECT xact_commit, xact_rollback, blks_read, blks_hit, temp_files, temp_bytes, tup_returned, tup_fetched
+    FROM pg_stat_database
+    WHERE datname = current_database()
+"""
+IO_SQL = """
+    SELECT backend_type, object, context, reads, writes, extends, hits, evictions
+    FROM pg_stat_io
+    WHERE backend_type = 'client backend' AND (reads > 0 OR writes > 0 OR hits > 0)
+"""
+STATEMENT_FIELDS = ("queryid", "calls", "total_exec_time", "rows", "shared_blks_hit",
+                    "shared_blks_read", "temp_blks_written", "query")
+COST_FIELDS = STATEMENT_FIELDS[1:-1]
+
+
+class ServerMonitor:
+    def __init__(self, db_config, path="server_stats.jsonl", interval=1.0):
+        self.db_config = db_config
+        self.path = path
+        self.interval = interval
+        self.running = threading.Event()
+        self.thread = None
+        self.has_statements = False
+        self.has_io = False
+        self.baseline = {}
+        self.latest = {}
+        # queryid -> {"rule": ..., "role": ..., "tests": [...]}
+        self.query_labels = {}
+        self.lock = threading.Lock()
+
+    def register(self, query_id, rule, role, test_index):
+        """Remember which rule/test produced the statement with `query_id`."""
+        if query_id is None:
+            return
+        with self.lock:
+            new = query_id not in self.query_labels
+            label = self.query_labels.setdefault(query_id, {"rule": rule, "role": role, "tests": []})
+            if len(label["tests"]) < 20:
+                label["tests"].append(test_index)
+        if new:
+            self._append({"time": time.time(), "query_label": {"queryid": query_id, "rule": rule, "role": role,
+                                                               "test": test_index}})
+
+    def start(self):
+        import psycopg2
+
+        self.conn = psycopg2.connect(**self.db_config)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+                cur.execute(STATEMENTS_SQL + " LIMIT 1")
+                self.has_statements = True
+            except psycopg2.Error as e:
+                log.warning("pg_stat_statements unavailable (needs shared_preload_libraries): %s", e)
+            cur.execute("SELECT to_regclass('pg_catalog.pg_stat_io') IS NOT NULL")
+            self.has_io = cur.fetchone()[0]
+        self.baseline = self._statements()
+        self.running.set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.sample()
+        self.conn.close()
+
+    def _run(self):
+        while self.running.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                log.error("Server sampling failed: %s", e)
+            time.sleep(self.interval)
+
+    def _statements(self):
+        if not self.has_statements:
+            return {}
+        with self.conn.cursor() as cur:
+            cur.execute(STATEMENTS_SQL)
+            return {row[0]: dict(zip(STATEMENT_FIELDS, row)) for row in cur.fetchall()}
+
+    def sample(self):
+        record = {"time": time.time()}
+        with self.conn.cursor() as cur:
+            cur.execute(ACTIVITY_SQL)
+            record["activity"] = [
+                dict(zip(("pid", "backend_type", "state", "wait_event_type", "wait_event", "running_for", "query"), row))
+                for row in cur.fetchall()
+            ]
+            cur.execute(DATABASE_SQL)
+            record["database"] = dict(zip(
+                ("xact_commit", "xact_rollback", "blks_read", "blks_hit", "temp_files", "temp_bytes", "tup_returned", "tup_fetched"),
+                cur.fetchone()))
+            if self.has_io:
+                cur.execute(IO_SQL)
+                record["io"] = [
+                    dict(zip(("backend_type", "object", "context", "reads", "writes", "extends", "hits", "evictions"), row))
+                    for row in cur.fetchall()
+                ]
+        statements = self._statements()
+        with self.lock:
+            # Only statements that changed since the previous sample are written
+            record["statements"] = [
+                row for query_id, row in statements.items()
+                if self.latest.get(query_id, {}).get("calls") != row["calls"]
+            ]
+            self.latest = statements
+        self._append(record)
+
+    def _append(self, record):
+        # Called from the sampler and the fuzzer thread; a long line can take
+        # several writes, so appends are serialized to keep lines whole
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def record_backend_memory(self, conn, label):
+        """Sample memory of the backend behind `conn` (PostgreSQL 14+)."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT sum(total_bytes), sum(used_bytes) FROM pg_backend_memory_contexts")
+            total, used = cur.fetchone()
+        self._append({"time": time.time(), "backend_memory": {"label": label, "total_bytes": total, "used_bytes": used}})
+
+    def attribution(self):
+        """Server cost per (rule, role) since start(), most expensive first."""
+        totals = collections.defaultdict(lambda: dict.fromkeys(COST_FIELDS, 0))
+        with self.lock:
+            for query_id, row in self.latest.items():
+                label = self.query_labels.get(query_id)
+                if label is None:
+                    continue
+                before = self.baseline.get(query_id, {})
+                key = (label["rule"], label["role"])
+                for field in COST_FIELDS:
+                    totals[key][field] += float(row[field]) - float(before.get(field, 0))
+        return sorted(totals.items(), key=lambda item: item[1]["total_exec_time"], reverse=True)
+
+    def most_expensive(self, n=10):
+        """The n statements with the highest execution time since start(), with their labels."""
+        with self.lock:
+            rows = []
+            for query_id, row in self.latest.items():
+                before = self.baseline.get(query_id, {})
+                spent = float(row["total_exec_time"]) - float(before.get("total_exec_time", 0))
+                if spent > 0:
+                    rows.append((spent, query_id, self.query_labels.get(query_id), row["query"]))
+        return sorted(rows, key=lambda item: item[0], reverse=True)[:n]
@@ -0,0 +1,271 @@
+import collections
+
+from sqlglot import parse_one, exp
+from sqlglot.errors import ParseError
+
+import event_log
+
+log = event_log.get_logger(__name__)
+
+# Pre-flight checks for mutants, so PostgreSQL never sees SQL that can only
+# fail (each rejection there costs a round-trip plus a rollback).
+#
+# Types are coarse: "number", "text", "boolean", "datetime", "null" and
+# "unknown" (never rejected). A quoted literal stays untyped until it is
+# compared with something, like PostgreSQL's `unknown` literals.
+
+NUMBER_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+TEXT_TYPES = {"character varying", "character", "text"}
+DATETIME_TYPES = {"date", "timestamp without time zone", "timestamp with time zone", "time without time zone"}
+COMPARISONS = (exp.EQ, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE)
+ARITHMETIC = (exp.Add, exp.Sub, exp.Mul, exp.Div, exp.Mod)
+
+
+class InvalidMutant(Exception):
+    pass
+
+
+class StringLiteral:
+    """A quoted literal whose type is decided by what it is compared with."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def column_kind(data_type):
+    if data_type in NUMBER_TYPES:
+        return "number"
+    if data_type in TEXT_TYPES:
+        return "text"
+    if data_type == "boolean":
+        return "boolean"
+    if data_type in DATETIME_TYPES:
+        return "datetime"
+    return "unknown"
+
+
+def load_schema(conn):
+    """{table: {column: kind}} for the public schema, read once per connection."""
+    schema = collections.defaultdict(dict)
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+        """)
+        for table, column, data_type in cur.fetchall():
+            schema[table][column] = column_kind(data_type)
+    conn.commit()
+    return dict(schema)
+
+
+class MutantValidator:
+    def __init__(self, schema):
+        self.schema = schema
+        self.rejections = collections.Counter()
+        self.checked = collections.Counter()
+
+    def check(self, sql):
+        """Raise InvalidMutant if `sql` cannot run against the cached schema."""
+        try:
+            tree = parse_one(sql, dialect="postgres")
+        except ParseError as e:
+            raise InvalidMutant(f"syntax error: {str(e).splitlines()[0]}")
+        if not isinstance(tree, exp.Select):
+            return
+
+        scope = self._scope(tree)
+        for projection in tree.expressions:
+            if not isinstance(projection, exp.Star):
+                self._type(projection, scope)
+        for clause in ("where", "having"):
+            if tree.args.get(clause) is not None:
+                self._require(self._type(tree.args[clause].this, scope), "boolean", clause.upper())
+
+    def validate(self, sql, rewrites=()):
+        """Return None if `sql` looks valid, else the reason; count rejections per rule.
+
+        `rewrites` are the (rule, node) pairs of the mutator's tree. A rejection
+        is charged only to the rules whose own subtree fails; if none does, the
+        combination is at fault and every rule is charged.
+        """
+        rules = list(dict.fromkeys(rule for rule, _ in rewrites))
+        for rule in rules:
+            self.checked[rule] += 1
+        try:
+            self.check(sql)
+            return None
+        except InvalidMutant as e:
+            culprits = self.culprits(rewrites) or rules
+            for rule in culprits:
+                self.rejections[rule] += 1
+            log.debug("Rejected mutant, charged to rules %s: %s", culprits, e)
+            return str(e)
+
+    def culprits(self, rewrites):
+        """Rules whose rewritten subtree is invalid on its own, in the scope of its query."""
+        culprits = []
+        for rule, node in rewrites:
+            try:
+                self._type(node, self._scope(node.root()))
+            except InvalidMutant:
+                if rule not in culprits:
+                    culprits.append(rule)
+        return culprits
+
+    def rejection_rates(self):
+        return {rule: self.rejections[rule] / count for rule, count in self.checked.items()}
+
+    def _scope(self, tree):
+        """{alias: {column: kind}} of the relations `tree` reads."""
+        # CTEs and derived tables are in scope too, but their columns are not
+        # tracked (None): anything read from them is "unknown".
+        ctes = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+        scope = {}
+        for table in tree.find_all(exp.Table):
+            if table.name in ctes and not table.db:
+                scope[table.alias_or_name] = None
+                continue
+            if table.name not in self.schema:
+                raise InvalidMutant(f"relation {table.name} does not exist")
+            scope[table.alias_or_name] = self.schema[table.name]
+        for subquery in tree.find_all(exp.Subquery):
+            if subquery.alias:
+                scope[subquery.alias] = None
+        return scope
+
+    def _type(self, node, scope):
+        if isinstance(node, (exp.Paren, exp.Alias)):
+            return self._type(node.this, scope)
+        if isinstance(node, exp.Null):
+            return "null"
+        if isinstance(node, exp.Boolean):
+            return "boolean"
+        if isinstance(node, exp.Literal):
+            return StringLiteral(node.this) if node.is_string else "number"
+        if isinstance(node, exp.Column):
+            return self._column(node, scope)
+        if isinstance(node, COMPARISONS):
+            if isinstance(node.expression, exp.Is):
+                # sqlglot reads `a = b IS NULL` as `a = (b IS NULL)`; PostgreSQL
+                # binds the comparison first: `(a = b) IS NULL`.
+                self._unify(self._type(node.this, scope), self._type(node.expression.this, scope), node)
+                return "boolean"
+            self._unify(self._type(node.this, scope), self._type(node.expression, scope), node)
+            return "boolean"
+        if isinstance(node, exp.Between):
+            this = self._type(node.this, scope)
+            self._unify(this, self._type(node.args["low"], scope), node)
+            self._unify(this, self._type(node.args["high"], scope), node)
+            return "boolean"
+        if isinstance(node, (exp.And, exp.Or)):
+            self._require(self._type(node.this, scope), "boolean", "argument of AND/OR")
+            self._require(self._type(node.expression, scope), "boolean", "argument of AND/OR")
+            return "boolean"
+        if isinstance(node, exp.Not):
+            self._require(self._type(node.this, scope), "boolean", "argument of NOT")
+            return "boolean"
+        if isinstance(node, exp.Is):
+            self._type(node.this, scope)
+            return "boolean"
+        if isinstance(node, exp.Case):
+            result = self._type(node.args["default"], scope) if node.args.get("default") else "null"
+            for branch in node.args.get("ifs", []):
+                if not isinstance(branch, exp.If) or branch.args.get("true") is None:
+                    raise InvalidMutant("CASE branch without THEN value")
+                self._require(self._type(branch.this, scope), "boolean", "argument of CASE/WHEN")
+                result = self._unify(result, self._type(branch.args["true"], scope), node)
+            return result
+        if isinstance(node, ARITHMETIC):
+            self._unify(self._type(node.this, scope), "number", node)
+            self._unify(self._type(node.expression, scope), "number", node)
+            return "number"
+        # Anything else (functions, subqueries, casts): only check its columns.
+        for column in node.find_all(exp.Column):
+            self._column(column, scope)
+        return "unknown"
+
+    def _column(self, column, scope):
+        tables = [scope[column.table]] if column.table in scope else list(scope.values())
+        if column.table and column.table not in scope:
+            raise InvalidMutant(f"missing FROM-clause entry for table {column.table}")
+        for columns in tables:
+            if columns is not None and column.name in columns:
+                return columns[column.name]
+        if None in tables:
+            return "unknown"
+        raise InvalidMutant(f"column {column.name} does not exist")
+
+    def _unify(self, left, right, node):
+        """Common type of two operands, or InvalidMutant if PostgreSQL would reject the pair."""
+        if isinstance(left, StringLiteral) and isinstance(right, StringLiteral):
+            return "text"
+        if isinstance(left, StringLiteral):
+            left, right = right, left
+        if isinstance(right, StringLiteral):
+            self._coerce(right, left)
+            return left
+        if left in ("unknown", "null"):
+            return right
+        if right in ("unknown", "null") or left == right:
+            return left
+        raise InvalidMutant(f"{left} and {right} cannot be matched in {node.sql(dialect='postgres')}")
+
+    def _coerce(self, literal, kind):
+        if kind == "number":
+            try:
+                float(literal.value)
+            except ValueError:
+                raise InvalidMutant(f"invalid input syntax for type {kind}: '{literal.value}'")
+        elif kind == "boolean" and literal.value.lower() not in ("t", "f", "true", "false", "yes", "no", "on", "off", "1", "0"):
+            raise InvalidMutant(f"invalid input syntax for type boolean: '{literal.value}'")
+
+    def _require(self, kind, expected, context):
+        if isinstance(kind, StringLiteral):
+            self._coerce(kind, expected)
+        elif kind not in (expected, "null", "unknown"):
+            raise InvalidMutant(f"{context} must be type {expected}, not {kind}")
+
+
+if __name__ == "__main__":
+    # Regression checks against the fixture schema from database.py
+    fixture_schema = {
+        "users": {"id": "number", "name": "text", "age": "number"},
+        "employees": {"id": "number", "name": "text", "salary": "number"},
+    }
+    cases = [
+        ("SELECT name FROM users WHERE age > 25 AND age < 40", True),
+        ("WITH t AS (SELECT * FROM users) SELECT * FROM t", True),
+        ("WITH t AS (SELECT name FROM users) SELECT name FROM t WHERE name = 'x'", True),
+        ("SELECT s.n FROM (SELECT name AS n FROM users) AS s WHERE s.n = 'x'", True),
+        ("SELECT u.name FROM users AS u JOIN (SELECT id FROM employees) AS e ON u.id = e.id", True),
+        ("SELECT name FROM missing_table", False),
+        ("SELECT x.name FROM users", False),
+        ("SELECT salary FROM users", False),
+        ("SELECT name FROM users WHERE age = 'abc'", False),
+        ("SELECT name FROM users WHERE (CASE WHEN 1 = 2 THEN 3 ELSE age END) > 1", True),
+    ]
+    validator = MutantValidator(fixture_schema)
+    failures = 0
+    for sql, valid in cases:
+        reason = validator.validate(sql)
+        status = "ok" if (reason is None) == valid else "FAILED"
+        failures += status == "FAILED"
+        print(f"{status:6} {sql}" + (f"  ({reason})" if reason else ""))
+
+    # A rejection is charged to the rule whose rewrite is broken (a CASE
+    # branch without THEN), not to the valid rewrite next to it
+    tree = parse_one("SELECT * FROM users WHERE age BETWEEN 20 AND 30 AND id > 1", dialect="postgres")
+    between, comparison = tree.find(exp.Between), tree.find(exp.GT)
+    broken = between.replace(exp.Between(
+        this=between.this.copy(),
+        low=exp.Case(ifs=[exp.When(this=exp.false(), expression=exp.Literal.number(5))], default=between.args["low"].copy()),
+        high=between.args["high"].copy(),
+    ))
+    wrapped = comparison.replace(exp.Paren(this=exp.Or(this=exp.false(), expression=comparison.copy())))
+    validator.validate(tree.sql(dialect="postgres"), [("rule:3", broken), ("rule:1", wrapped)])
+    charged = dict(validator.rejections)
+    status = "ok" if charged == {"rule:3": 1} else "FAILED"
+    failures += status == "FAILED"
+    print(f"{status:6} rejection charged to {charged}")
+    raise SystemExit(1 if failures else 0)